@@ -1,11 +1,17 @@
 # Class to get dataref values from XPlane Flight Simulator via network. 
 # License: GPLv3
 
+import asyncio
 import socket
 import struct
 import binascii
-from time import sleep
+from time import sleep, monotonic
+from threading import Lock, Thread
+from queue import Queue, Empty, Full
 import platform
+import select
+
+import xp_capture
 
 class XPlaneIpNotFound(Exception):
   args="Could not find any running XPlane instance in network."
@@ -16,6 +22,88 @@ class XPlaneTimeout(Exception):
 class XPlaneVersionNotSupported(Exception):
   args="XPlane version not supported."
 
+# RREF answer: "RREF," header followed by (int idx, float value) pairs
+RREF_HEADER = b"RREF,"
+RREF_HEADER_LEN = len(RREF_HEADER)
+RREF_VALUE = struct.Struct("<if")
+# RREF request: "RREF\0" + int freq + int idx + 400 bytes dataref
+RREF_REQUEST = struct.Struct("<5sii400s")
+# CMND: "CMND\0" + 500 bytes command
+CMND_MESSAGE = struct.Struct("<4sx500s")
+# DREF: "DREF\0" + 4 byte value + 500 bytes dataref (0 terminated, space padded)
+DREF_MESSAGE = struct.Struct("<5sf500s")
+SUBSCRIBER_QUEUE_MAX = 64 # batches queued for a subscriber, older ones are merged when it falls behind
+# value of a DREF message, packed into a copy of the prebuilt message of the dataref
+DREF_VALUES = {
+  "float": struct.Struct("<f"),
+  "int": struct.Struct("<i"),
+  "bool": struct.Struct("<I"),
+}
+DREF_VALUE_OFFSET = 5
+
+class ChangeLog:
+
+  '''
+  Log of changed datarefs, read by consumers through their own cursor.
+  Work per read is proportional to the number of changes, not to the
+  number of subscribed datarefs.
+  '''
+
+  def __init__(self):
+    self.lock = Lock()
+    self.log = [] # changed datarefs in order of change
+    self.offset = 0 # change number of log[0]
+    self.cursors = {} # key = cursor, value = change number read up to, None before the first read
+    self.nextCursor = 0
+
+  def Update(self, values, newvalues):
+
+    '''
+    Merge newvalues into values and log the datarefs whose value changed.
+    '''
+
+    with self.lock:
+      if self.cursors:
+        self.log.extend([name for name, value in newvalues.items() if values.get(name) != value])
+      values.update(newvalues)
+
+  def NewCursor(self):
+    with self.lock:
+      cursor = self.nextCursor
+      self.nextCursor += 1
+      self.cursors[cursor] = None
+    return cursor
+
+  def ResetCursor(self, cursor):
+    '''
+    The next read of cursor returns all values again, e.g. after a reconnect.
+    '''
+    with self.lock:
+      self.cursors[cursor] = None
+
+  def Read(self, cursor, values):
+
+    '''
+    Return dict dataref -> value of all datarefs changed since the last read
+    of this cursor. The first read returns all values.
+    '''
+
+    with self.lock:
+      end = self.offset + len(self.log)
+      pos = self.cursors[cursor]
+      if pos is None:
+        changes = values.copy()
+      else:
+        changes = {name: values[name] for name in self.log[pos - self.offset:] if name in values}
+      self.cursors[cursor] = end
+      # drop log entries all cursors have read
+      low = min((p for p in self.cursors.values() if p is not None), default=end)
+      if low > self.offset:
+        del self.log[:low - self.offset]
+        self.offset = low
+    return changes
+
+
 class XPlaneUdp:
 
   '''
@@ -27,107 +115,389 @@ class XPlaneUdp:
   MCAST_GRP = "239.255.1.1"
   MCAST_PORT = 49707 # (MCAST_PORT was 49000 for XPlane10)
   
-  def __init__(self):
+  def __init__(self, rcvbuf = None):
     # Open a UDP Socket to receive on Port 49000
     self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     self.socket.settimeout(3.0)
+    if rcvbuf:
+      # room for the datagrams X-Plane sends while the devices are busy
+      self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
     # list of requested datarefs with index number
     self.datarefidx = 0
     self.datarefs = {} # key = idx, value = dataref
+    self.datarefidxs = {} # key = dataref, value = idx
+    self.datarefnames = [] # list index = idx, value = dataref or None, used by the decoder
     # values from xplane
     self.BeaconData = {}
     self.xplaneValues = {}
+    self.changes = ChangeLog()
     self.defaultFreq = 1
+    # prebuilt CMND and DREF messages
+    self.commandMessages = {} # key = command, value = message
+    self.datarefMessages = {} # key = dataref, value = DREF message with value 0
+    # RREF registration pipeline: requests are paced to rrefRate packets per second
+    # (sent in bursts of rrefBurst), confirmed by the first value received for the idx
+    # and resent up to rrefRetries times if no value arrived in time.
+    self.rrefRate = 5000
+    self.rrefBurst = 100
+    self.rrefRetries = 3
+    self.pending = {} # key = idx, value = [message, sent, retries, freq] of unconfirmed requests
+    self.pendingLock = Lock()
+    self.pendingCheck = 0.0
+    self.subscribeStart = None
+    self.subscribeCount = 0
+    self.subscribeTime = None # seconds until all requested datarefs sent their first value
+    # drain mode: GetValues reads all queued datagrams, last value wins
+    self.drainMode = False
+    self.drainStats = {"drains": 0, "datagrams": 0, "last": 0, "max": 0, "queued": 0, "queued_max": 0}
+    # receive buffer, reused for every datagram to avoid copies
+    self.rxbuffer = bytearray(1472) # maximum bytes of an RREF answer X-Plane will send (Ethernet MTU - IP hdr - UDP hdr)
+    self.rxview = memoryview(self.rxbuffer)
+    # capture log, see xp_capture.py
+    self.capture = None
 
   def __del__(self):
-    for i in range(len(self.datarefs)):
-      self.AddDataRef(next(iter(self.datarefs.values())), freq=0)
+    if "IP" in self.BeaconData:
+      self.RemoveDataRefs()
+    self.StopCapture()
     self.socket.close()
 
-  def SendCommand(self,command):
-    message = struct.pack("<4sx500s", b'CMND', command.encode('utf-8'))
-    self.socket.sendto(message, (self.BeaconData["IP"], self.UDP_PORT))
+  def StartCapture(self, path):
+    '''
+    Tee every datagram sent and received into a capture log, replay with xp_capture.py.
+    '''
+    self.StopCapture()
+    self.capture = xp_capture.CaptureWriter(path)
 
-  def WriteDataRef(self,dataref,value,vtype='float'):
+  def StopCapture(self):
+    capture = self.capture
+    self.capture = None
+    if capture:
+      capture.close() # writes of other threads still holding it are ignored
+
+  def _Sendto(self, message, address):
+    capture = self.capture # StopCapture may run in another thread
+    if capture:
+      capture.write(xp_capture.TX, message)
+    self.socket.sendto(message, address)
+
+  def _CommandMessage(self, command):
+    message = self.commandMessages.get(command)
+    if message is None:
+      message = self.commandMessages[command] = CMND_MESSAGE.pack(b'CMND', command.encode('utf-8'))
+    return message
+
+  def _DataRefMessage(self, dataref, value, vtype='float'):
     '''
-    Write Dataref to XPlane
     DREF0+(4byte byte value)+dref_path+0+spaces to complete the whole message to 509 bytes
     DREF0+(4byte byte value of 1)+ sim/cockpit/switches/anti_ice_surf_heat_left+0+spaces to complete to 509 bytes
+    The message is built once per dataref, every call patches the value into its own copy.
     '''
-    cmd = b"DREF\x00"
-    dataref  =dataref+'\x00'
-    string = dataref.ljust(500).encode()
-    message = "".encode()
-    if vtype == "float":
-      message = struct.pack("<5sf500s", cmd,value,string)
-    elif vtype == "int":
-      message = struct.pack("<5si500s", cmd, value, string)
+    template = self.datarefMessages.get(dataref)
+    if template is None:
+      template = self.datarefMessages[dataref] = DREF_MESSAGE.pack(b"DREF\x00", 0.0, (dataref + '\x00').ljust(500).encode())
+    if vtype == "int":
+      value = int(value)
     elif vtype == "bool":
-      message = struct.pack("<5sI500s", cmd, int(value), string)
+      value = int(value) & 0xFFFFFFFF
+    message = bytearray(template)
+    DREF_VALUES[vtype].pack_into(message, DREF_VALUE_OFFSET, value)
+    return message
 
-    assert(len(message)==509)
-    self.socket.sendto(message, (self.BeaconData["IP"], self.UDP_PORT))
+  def SendCommand(self,command):
+    self._Sendto(self._CommandMessage(command), (self.BeaconData["IP"], self.UDP_PORT))
 
-  def AddDataRef(self, dataref, freq = None):
+  def SendCommands(self, commands):
+    '''
+    Send a list of commands, e.g. a burst of knob detents.
+    '''
+    address = (self.BeaconData["IP"], self.UDP_PORT)
+    sendto = self._Sendto
+    for command in commands:
+      sendto(self._CommandMessage(command), address)
 
+  def WriteDataRef(self,dataref,value,vtype='float'):
     '''
-    Configure XPlane to send the dataref with a certain frequency.
-    You can disable a dataref by setting freq to 0. 
+    Write Dataref to XPlane
     '''
+    self._Sendto(self._DataRefMessage(dataref, value, vtype), (self.BeaconData["IP"], self.UDP_PORT))
 
-    idx = -9999
+  def WriteDataRefs(self, writes):
+    '''
+    Write a list of (dataref, value) or (dataref, value, vtype) tuples to XPlane.
+    '''
+    address = (self.BeaconData["IP"], self.UDP_PORT)
+    sendto = self._Sendto
+    for write in writes:
+      sendto(self._DataRefMessage(*write), address)
 
-    if freq == None:
-      freq = self.defaultFreq
+  def _RrefRequest(self, dataref, freq):
 
-    if dataref in self.datarefs.values():
-      idx = list(self.datarefs.keys())[list(self.datarefs.values()).index(dataref)]
+    '''
+    Update the dataref registry and return the RREF request for it.
+    Returns None if there is nothing to send (unsubscribe of an unknown dataref).
+    '''
+
+    idx = self.datarefidxs.get(dataref)
+    if idx is not None:
       if freq == 0:
-        if dataref in self.xplaneValues.keys():
-          del self.xplaneValues[dataref]
+        self.xplaneValues.pop(dataref, None)
         del self.datarefs[idx]
+        del self.datarefidxs[dataref]
+        self.datarefnames[idx] = None
+    elif freq == 0:
+      return None
     else:
       idx = self.datarefidx
-      self.datarefs[self.datarefidx] = dataref
+      self.datarefs[idx] = dataref
+      self.datarefidxs[dataref] = idx
+      self.datarefnames.append(dataref)
       self.datarefidx += 1
-    
-    cmd = b"RREF\x00"
-    string = dataref.encode()
-    message = struct.pack("<5sii400s", cmd, freq, idx, string)
-    assert(len(message)==413)
-    self.socket.sendto(message, (self.BeaconData["IP"], self.BeaconData["Port"]))
-    if (self.datarefidx%100 == 0):
-      sleep(0.2)
 
-  def GetValues(self):
+    return idx, RREF_REQUEST.pack(b"RREF\x00", freq, idx, dataref.encode())
+
+  def _SendRrefRequests(self, messages):
+
+    '''
+    Send RREF requests paced to self.rrefRate packets per second.
+    '''
+
+    address = (self.BeaconData["IP"], self.BeaconData["Port"])
+    interval = 1.0 / self.rrefRate
+    start = monotonic()
+    for i, message in enumerate(messages):
+      self._Sendto(message, address)
+      if (i + 1) % self.rrefBurst == 0:
+        delay = start + (i + 1) * interval - monotonic()
+        if delay > 0:
+          sleep(delay)
+
+  def _ConfirmPending(self, indices):
+
+    '''
+    Remove the indices received in an RREF datagram from the pending requests.
+    '''
+
+    with self.pendingLock:
+      pending = self.pending
+      for idx in indices:
+        pending.pop(idx, None)
+    self._CheckPending()
+
+  def _CheckPending(self):
+
+    '''
+    Resend requests without answer and report the time to full subscription.
+    Called for received datagrams and on receive timeouts, so requests are
+    resent even if XPlane sends nothing at all.
+    '''
+
+    resend = []
+    with self.pendingLock:
+      pending = self.pending
+      now = monotonic()
+      if pending and now - self.pendingCheck > 0.1:
+        self.pendingCheck = now
+        for idx, request in list(pending.items()):
+          message, sent, retries, freq = request
+          if now - sent < 1.0 / freq + 0.25: # first value is sent within one period
+            continue
+          if retries >= self.rrefRetries:
+            print(f"no value for dataref {self.datarefnames[idx]} after {retries} retries, giving up")
+            del pending[idx]
+            continue
+          request[1] = now
+          request[2] += 1
+          resend.append(message)
+      if not pending and self.subscribeStart is not None:
+        self.subscribeTime = now - self.subscribeStart
+        self.subscribeStart = None
+        print(f"{self.subscribeCount} datarefs subscribed in {self.subscribeTime:.3f} s")
+    if resend:
+      self._SendRrefRequests(resend)
+
+  def AddDataRef(self, dataref, freq = None):
+
+    '''
+    Configure XPlane to send the dataref with a certain frequency.
+    You can disable a dataref by setting freq to 0. 
+    '''
+
+    self.AddDataRefs([(dataref, freq)])
+
+  def AddDataRefs(self, datarefs):
+
+    '''
+    Configure XPlane to send a list of datarefs.
+    datarefs is a list of (dataref, freq) tuples, freq None uses the default frequency
+    and freq 0 disables the dataref. All requests are built in one pass and then sent.
+    '''
+
+    self._SendRrefRequests(self._PrepareRrefRequests(datarefs))
+
+  def _PrepareRrefRequests(self, datarefs):
+
+    '''
+    Register a list of (dataref, freq) tuples, mark them pending and
+    return the RREF requests to send.
+    '''
+
+    messages = []
+    requests = {}
+    removed = []
+    start = monotonic()
+    for dataref, freq in datarefs:
+      if freq == None:
+        freq = self.defaultFreq
+      request = self._RrefRequest(dataref, freq)
+      if request is None:
+        continue
+      idx, message = request
+      if freq > 0:
+        # expected send time, values may arrive before the whole list is sent
+        requests[idx] = [message, start + len(messages) / self.rrefRate, 0, freq]
+      else:
+        removed.append(idx)
+      messages.append(message)
+
+    with self.pendingLock:
+      for idx in removed:
+        self.pending.pop(idx, None)
+      if requests:
+        if self.subscribeStart is None:
+          self.subscribeStart = start
+          self.subscribeCount = 0
+        self.subscribeCount += len(requests)
+        self.pending.update(requests)
+    return messages
+
+  def RemoveDataRefs(self, datarefs = None):
+
+    '''
+    Disable a list of datarefs, or all registered datarefs if datarefs is None.
+    Used on shutdown and on aircraft changes.
+    '''
+
+    if datarefs is None:
+      datarefs = list(self.datarefidxs)
+    self.AddDataRefs([(dataref, 0) for dataref in datarefs])
+
+  def DecodeRref(self, data, retvalues = None, indices = None):
+
+    '''
+    Decode one RREF datagram (bytes or memoryview) without copying it.
+    Returns a dict dataref -> value for all known indices, values are
+    added to retvalues if given. The received indices are appended to
+    indices if given.
+    '''
+
+    if retvalues is None:
+      retvalues = {}
+    if data[0:RREF_HEADER_LEN] != RREF_HEADER: # (was b"RREFO" for XPlane10)
+      print("Unknown packet: ", binascii.hexlify(data))
+      return retvalues
+    # * We get 8 bytes for every dataref sent:
+    #   An integer for idx and the float value.
+    end = RREF_HEADER_LEN + (len(data) - RREF_HEADER_LEN) // RREF_VALUE.size * RREF_VALUE.size
+    names = self.datarefnames
+    numnames = len(names)
+    for idx, value in RREF_VALUE.iter_unpack(data[RREF_HEADER_LEN:end]):
+      if indices is not None:
+        indices.append(idx)
+      if 0 <= idx < numnames:
+        name = names[idx]
+        if name is not None:
+          # convert -0.0 values to positive 0.0
+          if -0.001 < value < 0.0:
+            value = 0.0
+          retvalues[name] = value
+    return retvalues
+
+  def _ReceiveDatagram(self, retvalues):
+    nbytes, addr = self.socket.recvfrom_into(self.rxbuffer)
+    data = self.rxview[:nbytes]
+    capture = self.capture
+    if capture:
+      capture.write(xp_capture.RX, data)
+    self._ProcessDatagram(data, retvalues)
+
+  def _ProcessDatagram(self, data, retvalues):
+    if self.pending:
+      indices = []
+      self.DecodeRref(data, retvalues, indices)
+      self._ConfirmPending(indices)
+    else:
+      self.DecodeRref(data, retvalues)
+
+  def ReceiveValues(self, drain = None):
+
+    '''
+    Receive one datagram and return only the values decoded from it.
+    In drain mode all datagrams already queued in the socket are read
+    and merged as well, the latest value of a dataref wins.
+    '''
+
+    if drain is None:
+      drain = self.drainMode
+    retvalues = {}
     try:
       # Receive packet
-      data, addr = self.socket.recvfrom(1472) # maximum bytes of an RREF answer X-Plane will send (Ethernet MTU - IP hdr - UDP hdr)
-      # Decode Packet
-      retvalues = {}
-      # * Read the Header "RREFO".
-      header=data[0:5]
-      if(header!=b"RREF,"): # (was b"RREFO" for XPlane10)
-        print("Unknown packet: ", binascii.hexlify(data))
-      else:
-        # * We get 8 bytes for every dataref sent:
-        #   An integer for idx and the float value. 
-        values =data[5:]
-        lenvalue = 8
-        numvalues = int(len(values)/lenvalue)
-        for i in range(0,numvalues):
-          singledata = data[(5+lenvalue*i):(5+lenvalue*(i+1))]
-          (idx,value) = struct.unpack("<if", singledata)
-          if idx in self.datarefs.keys():
-            # convert -0.0 values to positive 0.0 
-            if value < 0.0 and value > -0.001 :
-              value = 0.0
-            retvalues[self.datarefs[idx]] = value
-      self.xplaneValues.update(retvalues)
-    except:
+      self._ReceiveDatagram(retvalues)
+    except OSError:
+      if self.pending:
+        self._CheckPending() # XPlane may have dropped all requests
       raise XPlaneTimeout
+    if drain:
+      datagrams = 1
+      try:
+        while select.select([self.socket], [], [], 0)[0]:
+          self._ReceiveDatagram(retvalues)
+          datagrams += 1
+      except OSError:
+        pass
+      stats = self.drainStats
+      stats["drains"] += 1
+      stats["datagrams"] += datagrams
+      stats["last"] = datagrams
+      stats["max"] = max(stats["max"], datagrams)
+      stats["queued"] = datagrams - 1 # read in the same drain after the first one
+      stats["queued_max"] = max(stats["queued_max"], datagrams - 1)
+    self.changes.Update(self.xplaneValues, retvalues)
+    return retvalues
+
+  def GetValues(self):
+    self.ReceiveValues()
     return self.xplaneValues
 
+  def GetDrainStats(self):
+    '''
+    Return a copy of the drain counters of ReceiveValues: drains, datagrams read,
+    datagrams of the last and the largest drain, datagrams read after the first
+    one (last and max) and the mean datagrams per drain.
+    '''
+    stats = dict(self.drainStats)
+    stats["mean"] = stats["datagrams"] / stats["drains"] if stats["drains"] else 0.0
+    return stats
+
+  def ChangeCursor(self):
+    '''
+    Create a cursor for GetChanges, one per consumer.
+    '''
+    return self.changes.NewCursor()
+
+  def ResetCursor(self, cursor):
+    '''
+    Let the next GetChanges of cursor return all values again.
+    '''
+    self.changes.ResetCursor(cursor)
+
+  def GetChanges(self, cursor):
+    '''
+    Return dict dataref -> value of all datarefs changed since the last GetChanges
+    with this cursor. The first call returns all values.
+    '''
+    return self.changes.Read(cursor, self.xplaneValues)
+
   def FindIp(self):
 
       '''
@@ -212,6 +582,322 @@ class XPlaneUdp:
 
       return self.BeaconData
 
+class XPlaneUdpHub:
+
+  '''
+  One XPlaneUdp socket shared by all devices of the process.
+  Subscriptions are deduplicated by dataref name, XPlane sends each dataref
+  with the maximum frequency any subscriber requested. Every datagram is
+  decoded once and the values are fanned out to the subscriber queues.
+  '''
+
+  def __init__(self, ip, port, rcvbuf = None):
+    self.xp = XPlaneUdp(rcvbuf)
+    self.xp.drainMode = True
+    self.xp.BeaconData["IP"] = ip
+    self.xp.BeaconData["Port"] = port
+    self.xp.UDP_PORT = port
+    self.lock = Lock()
+    self.freqs = {} # key = dataref, value = dict subscriber -> freq
+    self.routes = {} # key = dataref, value = tuple of subscribers
+    self.thread = Thread(target=self._Receiver, daemon=True)
+    self.thread.start()
+
+  def Subscriber(self, name):
+    return XPlaneUdpSubscriber(self, name)
+
+  def GetDrainStats(self):
+    return self.xp.GetDrainStats()
+
+  def Subscribe(self, subscriber, datarefs):
+
+    '''
+    Add (freq > 0) or remove (freq 0) datarefs for one subscriber.
+    Requests are always forwarded to XPlane, so a reconnecting XPlane gets them again.
+    '''
+
+    requests = []
+    with self.lock:
+      for dataref, freq in datarefs:
+        if freq == None:
+          freq = self.xp.defaultFreq
+        subscribers = self.freqs.setdefault(dataref, {})
+        if freq == 0:
+          subscribers.pop(subscriber, None)
+        else:
+          subscribers[subscriber] = freq
+        if subscribers:
+          self.routes[dataref] = tuple(subscribers)
+          requests.append((dataref, max(subscribers.values())))
+        else:
+          del self.freqs[dataref]
+          self.routes.pop(dataref, None)
+          requests.append((dataref, 0))
+    self.xp.AddDataRefs(requests)
+
+  def _Receiver(self):
+    while True:
+      try:
+        values = self.xp.ReceiveValues()
+      except XPlaneTimeout:
+        sleep(0.1) # socket may not be bound before the first request is sent
+        continue
+      batches = {}
+      routes = self.routes
+      for dataref, value in values.items():
+        for subscriber in routes.get(dataref, ()):
+          batch = batches.get(subscriber)
+          if batch is None:
+            batch = batches[subscriber] = {}
+          batch[dataref] = value
+      for subscriber, batch in batches.items():
+        subscriber._Put(batch)
+
+
+class XPlaneUdpSubscriber:
+
+  '''
+  Per device view of a XPlaneUdpHub with the same interface as XPlaneUdp.
+  GetValues returns only the datarefs this subscriber requested.
+  '''
+
+  def __init__(self, hub, name):
+    self.hub = hub
+    self.name = name
+    self.queue = Queue(SUBSCRIBER_QUEUE_MAX)
+    self.xplaneValues = {}
+    self.changes = ChangeLog()
+    self.BeaconData = hub.xp.BeaconData
+
+  def __repr__(self):
+    return f"XPlaneUdpSubscriber({self.name})"
+
+  def _Put(self, batch):
+    '''
+    Queue a batch from the hub. If the subscriber does not keep up (or stopped
+    reading), all queued batches are merged into one, last value wins, so the
+    memory stays bounded and no dataref change is lost.
+    '''
+    queue = self.queue
+    try:
+      queue.put_nowait(batch)
+      return
+    except Full:
+      pass
+    with queue.mutex: # merge in place, GetValues must not read in between
+      merged = {}
+      for queued in queue.queue:
+        merged.update(queued)
+      merged.update(batch)
+      queue.queue.clear()
+      queue.queue.append(merged)
+      queue.not_empty.notify()
+
+  def SendCommand(self, command):
+    self.hub.xp.SendCommand(command)
+
+  def SendCommands(self, commands):
+    self.hub.xp.SendCommands(commands)
+
+  def WriteDataRef(self, dataref, value, vtype='float'):
+    self.hub.xp.WriteDataRef(dataref, value, vtype)
+
+  def WriteDataRefs(self, writes):
+    self.hub.xp.WriteDataRefs(writes)
+
+  def AddDataRef(self, dataref, freq = None):
+    self.hub.Subscribe(self, [(dataref, freq)])
+
+  def AddDataRefs(self, datarefs):
+    self.hub.Subscribe(self, datarefs)
+
+  def RemoveDataRefs(self, datarefs = None):
+    if datarefs is None:
+      with self.hub.lock:
+        datarefs = [d for d, subscribers in self.hub.freqs.items() if self in subscribers]
+    self.hub.Subscribe(self, [(dataref, 0) for dataref in datarefs])
+    for dataref in datarefs:
+      self.xplaneValues.pop(dataref, None)
+
+  def GetValues(self):
+    try:
+      batch = self.queue.get(timeout=3.0)
+    except Empty:
+      raise XPlaneTimeout
+    while True:
+      self.changes.Update(self.xplaneValues, batch)
+      try:
+        batch = self.queue.get_nowait()
+      except Empty:
+        break
+    return self.xplaneValues
+
+  def ChangeCursor(self):
+    return self.changes.NewCursor()
+
+  def ResetCursor(self, cursor):
+    self.changes.ResetCursor(cursor)
+
+  def GetChanges(self, cursor):
+    return self.changes.Read(cursor, self.xplaneValues)
+
+
+class XPlaneUdpProtocol(asyncio.DatagramProtocol):
+
+  def __init__(self, xp):
+    self.xp = xp
+
+  def datagram_received(self, data, addr):
+    self.xp._DatagramReceived(data)
+
+  def error_received(self, exc):
+    print(f"XPlane UDP error: {exc}")
+
+
+class XPlaneUdpAsync(XPlaneUdp):
+
+  '''
+  asyncio variant of XPlaneUdp based on a DatagramProtocol.
+  Dataref registry, decoder and change log are the ones of XPlaneUdp,
+  so the sync methods (AddDataRefs, WriteDataRef, SendCommand, GetChanges)
+  stay usable as thin wrappers around the same socket.
+  The socket is read by the protocol only: GetValues returns the latest
+  values it received, ReceiveValues is not available.
+  '''
+
+  def __init__(self, ip, port, rcvbuf = None):
+    XPlaneUdp.__init__(self, rcvbuf)
+    self.BeaconData["IP"] = ip
+    self.BeaconData["Port"] = port
+    self.UDP_PORT = port
+    self.timeout = 3.0
+    self.transport = None
+    self.listeners = [] # asyncio queues of the running subscribe() iterators
+
+  async def connect(self):
+    loop = asyncio.get_running_loop()
+    self.transport, protocol = await loop.create_datagram_endpoint(lambda: XPlaneUdpProtocol(self), sock=self.socket)
+
+  def close(self):
+    if self.transport:
+      self.transport.close()
+      self.transport = None
+
+  def ReceiveValues(self, drain = None):
+    raise RuntimeError("XPlaneUdpAsync receives in the event loop, use subscribe() or GetValues()")
+
+  def GetValues(self):
+    '''
+    Latest values received by the protocol, does not wait for new ones.
+    '''
+    return self.xplaneValues
+
+  def _DatagramReceived(self, data):
+    capture = self.capture
+    if capture:
+      capture.write(xp_capture.RX, data)
+    retvalues = {}
+    self._ProcessDatagram(memoryview(data), retvalues)
+    values = self.xplaneValues
+    changes = {name: value for name, value in retvalues.items() if values.get(name) != value}
+    self.changes.Update(values, changes)
+    for queue in self.listeners:
+      queue.put_nowait(changes)
+
+  def _Sendto(self, message, address):
+    capture = self.capture
+    if capture:
+      capture.write(xp_capture.TX, message)
+    self.transport.sendto(message, address)
+
+  def _SendRrefRequests(self, messages):
+    # used for resends from the protocol callback, must not sleep
+    if self.transport is None:
+      return
+    address = (self.BeaconData["IP"], self.BeaconData["Port"])
+    for message in messages:
+      self._Sendto(message, address)
+
+  async def add_datarefs(self, datarefs):
+
+    '''
+    Subscribe a list of (dataref, freq) tuples, requests are paced to rrefRate.
+    '''
+
+    address = (self.BeaconData["IP"], self.BeaconData["Port"])
+    for i, message in enumerate(self._PrepareRrefRequests(datarefs)):
+      self._Sendto(message, address)
+      if (i + 1) % self.rrefBurst == 0:
+        await asyncio.sleep(self.rrefBurst / self.rrefRate)
+
+  async def remove_datarefs(self, datarefs = None):
+    if datarefs is None:
+      datarefs = list(self.datarefidxs)
+    await self.add_datarefs([(dataref, 0) for dataref in datarefs])
+
+  async def send_command(self, command):
+    self._Sendto(self._CommandMessage(command), (self.BeaconData["IP"], self.UDP_PORT))
+
+  async def send_commands(self, commands):
+    for command in commands:
+      self._Sendto(self._CommandMessage(command), (self.BeaconData["IP"], self.UDP_PORT))
+
+  async def write_dataref(self, dataref, value, vtype='float'):
+    self._Sendto(self._DataRefMessage(dataref, value, vtype), (self.BeaconData["IP"], self.UDP_PORT))
+
+  async def write_datarefs(self, writes):
+    for write in writes:
+      self._Sendto(self._DataRefMessage(*write), (self.BeaconData["IP"], self.UDP_PORT))
+
+  async def subscribe(self, datarefs):
+
+    '''
+    Async iterator of change sets (dict dataref -> value) for a list of
+    (dataref, freq) tuples. The first change set contains all values.
+    Raises XPlaneTimeout if XPlane sends nothing for self.timeout seconds.
+    '''
+
+    names = set(dataref for dataref, freq in datarefs)
+    queue = asyncio.Queue()
+    self.listeners.append(queue)
+    try:
+      await self.add_datarefs(datarefs)
+      first = True
+      while True:
+        try:
+          changes = await asyncio.wait_for(queue.get(), self.timeout)
+        except asyncio.TimeoutError:
+          if self.pending:
+            self._CheckPending()
+          raise XPlaneTimeout
+        # merge everything queued meanwhile, last value wins
+        while not queue.empty():
+          changes = {**changes, **queue.get_nowait()}
+        if first:
+          changes = self.xplaneValues
+        changes = {name: value for name, value in changes.items() if name in names}
+        if changes:
+          first = False
+          yield changes
+    finally:
+      self.listeners.remove(queue)
+
+
+shared = None
+shared_lock = Lock()
+
+def shared_hub(ip, port, rcvbuf = None):
+
+  '''
+  Return the process wide XPlaneUdpHub, create it on first use.
+  '''
+
+  global shared
+  with shared_lock:
+    if shared is None:
+      shared = XPlaneUdpHub(ip, port, rcvbuf)
+  return shared
+
 # Example how to use:
 # You need a running xplane in your network. 
 if __name__ == '__main__':
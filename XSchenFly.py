@@ -4,6 +4,10 @@ VERSION = "v1.4+"
 # IP Address of machine running X-Plane. 
 UDP_IP = "127.0.0.1"
 UDP_PORT = 49000
+# Socket receive buffer for X-Plane RREF datagrams (bytes), None for OS default
+UDP_RCVBUF = 1024 * 1024
+# Record all X-Plane UDP traffic to this file for offline replay (xp_capture.py), None to disable
+UDP_CAPTURE_FILE = None
 
 from dataclasses import dataclass
 from enum import Enum, IntEnum
@@ -22,6 +26,7 @@ import devices.winwing_throttle
 import devices.winctrl_ecam
 import devices.rowsfire_a107
 import XPlaneUdp
+import xp_websocket
 
 class DrefType(Enum):
     DATA = 0
@@ -39,13 +44,39 @@ datacache = {}
 xp = None
 
 def kb_wait_quit_event():
-    print(f"*** Press ENTER to quit this script ***\n")
+    print(f"*** Press ENTER to quit this script, s + ENTER shows the UDP receive statistics and websocket latencies ***\n")
     while True:
         c = input() # wait for ENTER (not worth to implement kbhit for differnt plattforms, so make it very simple)
+        if c.strip() == "s":
+            print_udp_drain_stats()
+            print_websocket_latency()
+            continue
         print(f"Exit")
         os._exit(0)
 
 
+def print_udp_drain_stats():
+    if XPlaneUdp.shared is None:
+        print("udp not used")
+        return
+    stats = XPlaneUdp.shared.GetDrainStats()
+    print(f"udp: {stats['datagrams']} datagrams in {stats['drains']} reads, mean {stats['mean']:.2f}  max {stats['max']} datagrams per read")
+    print(f"  queued behind the first datagram: last {stats['queued']}  max {stats['queued_max']}")
+
+
+def print_websocket_latency():
+    if xp_websocket.shared is None:
+        print("websocket not used")
+        return
+    summary = xp_websocket.shared.latency_summary()
+    print(f"websocket: {summary['pending']} requests waiting for result")
+    for name, stats in summary.pop("roundtrip").items():
+        print(f"  {name:<26} {stats['count']:6} results  p50 {stats['p50_ms']:7.1f} ms  p99 {stats['p99_ms']:7.1f} ms  max {stats['max_ms']:7.1f} ms")
+    for name in ("submit", "reconnect"):
+        stats = summary[name]
+        print(f"  {name:<26} {stats['count']:6} calls    mean {stats['mean_ms']:6.2f} ms  max {stats['max_ms']:7.1f} ms")
+
+
 class UsbManager:
     def __init__(self):
         self.device = None
@@ -100,11 +131,11 @@ def main():
     kb_quit_event_thread = Thread(target=kb_wait_quit_event)
     kb_quit_event_thread.start()
 
-    xp = XPlaneUdp.XPlaneUdp()
-    xp.BeaconData["IP"] = UDP_IP # workaround to set IP and port
-    xp.BeaconData["Port"] = UDP_PORT
-    xp.UDP_PORT = xp.BeaconData["Port"]
-    print(f'waiting for X-Plane to connect on port {xp.BeaconData["Port"]}')
+    # one UDP socket for all devices, main only subscribes the heartbeat dataref
+    xp = XPlaneUdp.shared_hub(UDP_IP, UDP_PORT, UDP_RCVBUF).Subscriber("main")
+    if UDP_CAPTURE_FILE:
+        XPlaneUdp.shared.xp.StartCapture(UDP_CAPTURE_FILE)
+    print(f'waiting for X-Plane to connect on port {UDP_PORT}')
 
     dev_winctrl_agp = devices.winctrl_agp.device()
     dev_winctrl_agp.init_device()
@@ -152,7 +183,7 @@ def main():
             dev_winctrl_ecam.cyclic.set()
             values = xp.GetValues()
         except XPlaneUdp.XPlaneTimeout:
-            print(f'X-Plane timeout, could not connect on port {xp.BeaconData["Port"]}, waiting for X-Plane')
+            print(f'X-Plane timeout, could not connect on port {UDP_PORT}, waiting for X-Plane')
             xplane_connected = False
             dev_winctrl_agp.disconnected()
             dev_winwing_mcdu.disconnected()
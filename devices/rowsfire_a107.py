@@ -384,21 +384,19 @@ def xplane_ws_listener(data, led_dataref_ids): # receive ids and find led
         print(f"[A107] not defined {data}")
         return
 
-    for ref_id_str, value in data["data"].items():
-        ref_id = int(ref_id_str)
+    for ref_id, value in data["data"].items():
         #print(f"[A107] searching for {ref_id}...", end='')
         if ref_id in led_dataref_ids:
             ledobj = led_dataref_ids[ref_id]
 
-            if type(value) is list: # dataref array, ledlist array
+            if type(value) is dict or type(value) is list: # dataref array (dict of the used indices), ledlist array
                 if type(ledobj) != list:
                     print(f"[A107] ERROR: led array dataref not registered as list!")
                     exit()
-                idx = 0
-                for v in value:
+                for idx, v in (value.items() if type(value) is dict else enumerate(value)):
                     for l2 in ledobj: # we received an array, send update to all objects
                         if idx == l2.dreftype.value - DREF_TYPE.ARRAY_0.value:
-                            value_new = eval_data(value[idx], l2.eval)
+                            value_new = eval_data(v, l2.eval)
                             #print(f"[A107] array value[{idx}] of {l2.label} = {value_new}")
                             if "SEGMENT" not in l2.mf_name:
                                 rowsfire_a107_set_led(l2, value_new)
@@ -407,9 +405,7 @@ def xplane_ws_listener(data, led_dataref_ids): # receive ids and find led
                                     print(f"[A107] array value[{idx}] of {l2.label} = {value_new}")
                                     rowsfire_a107_set_lcd(l2, value_new)
                             xp.datacache[l2.dataref + '_' + str(idx)] = value_new
-
-                    idx += 1
-            elif type(ledobj) == list and type(value) != list: # multiple leds on same dataref (without dataref arry), for eval
+            elif type(ledobj) == list: # multiple leds on same dataref (without dataref arry), for eval
                 for l in ledobj:
                     value_new = eval_data(value, l.eval)
                     #print(f" found: {l.label} = {value}")
@@ -541,8 +537,7 @@ class device:
         print(f"[A107] X-Plane connected")
         xplane_get_dataref_ids(self.xp)
         print(f"[A107] subsrcibe datarefs... ", end="")
-        t = Thread(target=self.xp.datarefs_subscribe, args=(self.xp.led_dataref_ids, xplane_ws_listener))
-        t.start()
+        self.xp.datarefs_subscribe(self.xp.led_dataref_ids, xplane_ws_listener, xp_websocket.led_array_indices(self.xp.led_dataref_ids, DREF_TYPE.ARRAY_0))
         print(f"done")
         xplane_connected = True
         xp = self.xp
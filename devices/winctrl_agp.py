@@ -7,6 +7,7 @@ from threading import Thread, Event
 from time import sleep
 from datetime import datetime, timedelta, timezone
 
+import hid_reactor
 import xp_websocket
 
 # XSchenFly device module for the WINCTRL AGP 32 / AGP.
@@ -141,6 +142,8 @@ buttonlist = []
 ledlist = []
 buttons_press_event = [0] * BUTTONS_CNT
 buttons_release_event = [0] * BUTTONS_CNT
+buttons_last_lo = 0
+buttons_last_hi = 0
 
 
 def eval_data(value, eval_string):
@@ -427,8 +430,7 @@ def xplane_ws_listener(data, led_dataref_ids):
         return
 
     changed = False
-    for ref_id_str, value in data["data"].items():
-        ref_id = int(ref_id_str)
+    for ref_id, value in data["data"].items():
         if ref_id not in led_dataref_ids:
             continue
 
@@ -449,6 +451,7 @@ class UsbManager:
     def __init__(self):
         self.device = None
         self.device_config = 0
+        self.path = None # hid.enumerate() path of the device, hidapi opens the first match of vid/pid
 
     def connect_device(self, vid: int, pid: int):
         try:
@@ -477,6 +480,7 @@ class UsbManager:
                 if dev["vendor_id"] == d["vid"] and dev["product_id"] == d["pid"]:
                     print("found")
                     self.device_config |= d["mask"]
+                    self.path = dev["path"]
                     return d["vid"], d["pid"], self.device_config
             print("not found")
         return None, None, 0
@@ -575,10 +579,53 @@ def xplane_get_dataref_ids(xp):
     print("done")
 
 
-def agp32_create_events(xp, usb_mgr, display_mgr):
-    buttons_last_lo = 0
-    buttons_last_hi = 0
+def agp32_read_report(data_in):
+    global buttons_last_lo, buttons_last_hi
+    if not xplane_connected:
+        return
+    if len(data_in) not in VALID_REPORT_LENGTHS:
+        if len(data_in) != 0:
+            print(f"[AGP32] rx data count {len(data_in)} not yet supported")
+        return
+
+    if len(data_in) < 13:
+        return
+
+    report_id = data_in[0]
+    if report_id != REPORT_ID:
+        return
+
+    buttons_lo = 0
+    buttons_hi = 0
+
+    for i in range(8):
+        buttons_lo |= int(data_in[i + 1]) << (8 * i)
+    for i in range(4):
+        buttons_hi |= int(data_in[i + 9]) << (8 * i)
+
+    if buttons_lo == buttons_last_lo and buttons_hi == buttons_last_hi:
+        return
+
+    for i in range(BUTTONS_CNT):
+        if i < 64:
+            pressed_now = (buttons_lo >> i) & 1
+            pressed_before = (buttons_last_lo >> i) & 1
+        else:
+            pressed_now = (buttons_hi >> (i - 64)) & 1
+            pressed_before = (buttons_last_hi >> (i - 64)) & 1
+
+        if pressed_now != pressed_before:
+            if pressed_now:
+                buttons_press_event[i] = 1
+            else:
+                buttons_release_event[i] = 1
+
+    agp_button_event()
+    buttons_last_lo = buttons_lo
+    buttons_last_hi = buttons_hi
 
+
+def agp32_create_events(xp, usb_mgr, display_mgr):
     while True:
         if not xplane_connected:
             sleep(1)
@@ -592,47 +639,7 @@ def agp32_create_events(xp, usb_mgr, display_mgr):
             print(f"[AGP32] continue after usb-in error: {error}")
             sleep(0.5)
             continue
-
-        if len(data_in) not in VALID_REPORT_LENGTHS:
-            if len(data_in) != 0:
-                print(f"[AGP32] rx data count {len(data_in)} not yet supported")
-            continue
-
-        if len(data_in) < 13:
-            continue
-
-        report_id = data_in[0]
-        if report_id != REPORT_ID:
-            continue
-
-        buttons_lo = 0
-        buttons_hi = 0
-
-        for i in range(8):
-            buttons_lo |= int(data_in[i + 1]) << (8 * i)
-        for i in range(4):
-            buttons_hi |= int(data_in[i + 9]) << (8 * i)
-
-        if buttons_lo == buttons_last_lo and buttons_hi == buttons_last_hi:
-            continue
-
-        for i in range(BUTTONS_CNT):
-            if i < 64:
-                pressed_now = (buttons_lo >> i) & 1
-                pressed_before = (buttons_last_lo >> i) & 1
-            else:
-                pressed_now = (buttons_hi >> (i - 64)) & 1
-                pressed_before = (buttons_last_hi >> (i - 64)) & 1
-
-            if pressed_now != pressed_before:
-                if pressed_now:
-                    buttons_press_event[i] = 1
-                else:
-                    buttons_release_event[i] = 1
-
-        agp_button_event()
-        buttons_last_lo = buttons_lo
-        buttons_last_hi = buttons_hi
+        agp32_read_report(data_in)
 
 
 class device:
@@ -647,8 +654,7 @@ class device:
         print("[AGP32] X-Plane connected")
         xplane_get_dataref_ids(self.xp)
         print("[AGP32] subscribe datarefs ... ", end="")
-        t = Thread(target=self.xp.datarefs_subscribe, args=(self.xp.led_dataref_ids, xplane_ws_listener))
-        t.start()
+        self.xp.datarefs_subscribe(self.xp.led_dataref_ids, xplane_ws_listener)
         print("done")
         xplane_connected = True
         xp = self.xp
@@ -679,5 +685,6 @@ class device:
 
         create_button_list_agp32()
 
-        usb_event_thread = Thread(target=agp32_create_events, args=[self.xp, self.usb_mgr, self.display_mgr])
-        usb_event_thread.start()
+        if not hid_reactor.register(self.usb_mgr.path, agp32_read_report, "AGP32"):
+            usb_event_thread = Thread(target=agp32_create_events, args=[self.xp, self.usb_mgr, self.display_mgr])
+            usb_event_thread.start()
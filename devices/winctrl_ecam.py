@@ -4,6 +4,7 @@ import hid
 from threading import Thread, Event
 from time import sleep
 
+import hid_reactor
 import xp_websocket
 
 # XSchenFly device module for the WINCTRL 32 ECAM.
@@ -98,6 +99,7 @@ buttonlist = []
 ledlist = []
 buttons_press_event = [0] * BUTTONS_CNT
 buttons_release_event = [0] * BUTTONS_CNT
+buttons_last = 0
 
 
 def xor_bitmask(a, b, bitmask):
@@ -198,17 +200,16 @@ def xplane_ws_listener(data, led_dataref_ids):
             print(f"[ECAM32] send failed for {data}")
         return
 
-    for ref_id_str, value in data["data"].items():
-        ref_id = int(ref_id_str)
+    for ref_id, value in data["data"].items():
         if ref_id not in led_dataref_ids:
             continue
 
         ledobj = led_dataref_ids[ref_id]
-        if isinstance(ledobj, list) and not isinstance(value, list):
+        if isinstance(ledobj, list) and not isinstance(value, (list, dict)):
             for led in ledobj:
                 display_manager.set_led(led.nr, eval_data(value, led.eval))
-        elif isinstance(value, list):
-            for idx, v in enumerate(value):
+        elif isinstance(value, (list, dict)): # dict of the used indices
+            for idx, v in (value.items() if isinstance(value, dict) else enumerate(value)):
                 for led in ledobj:
                     if idx == led.dreftype.value - DREF_TYPE.ARRAY_0.value:
                         display_manager.set_led(led.nr, eval_data(v, led.eval))
@@ -220,6 +221,7 @@ class UsbManager:
     def __init__(self):
         self.device = None
         self.device_config = 0
+        self.path = None # hid.enumerate() path of the device, hidapi opens the first match of vid/pid
 
     def connect_device(self, vid: int, pid: int):
         try:
@@ -248,6 +250,7 @@ class UsbManager:
                 if dev["vendor_id"] == d["vid"] and dev["product_id"] == d["pid"]:
                     print("found")
                     self.device_config |= d["mask"]
+                    self.path = dev["path"]
                     return d["vid"], d["pid"], self.device_config
             print("not found")
         return None, None, 0
@@ -354,8 +357,33 @@ def xplane_get_dataref_ids(xp):
     print("done")
 
 
+def ecam32_read_report(usb_mgr, data_in):
+    global buttons_last
+    if not xplane_connected:
+        return
+    if len(data_in) not in VALID_REPORT_LENGTHS:
+        if len(data_in) != 0:
+            print(f"[ECAM32] rx data count {len(data_in)} not yet supported")
+        return
+    if len(data_in) < REPORT_BUTTON_OFFSET + REPORT_BUTTON_BYTES:
+        return
+
+    buttons = 0
+    for i in range(REPORT_BUTTON_BYTES):
+        buttons |= data_in[REPORT_BUTTON_OFFSET + i] << (8 * i)
+
+    for i in range(BUTTONS_CNT):
+        mask = 0x01 << i
+        if xor_bitmask(buttons, buttons_last, mask):
+            if buttons & mask:
+                buttons_press_event[i] = 1
+            else:
+                buttons_release_event[i] = 1
+            ecam_button_event(usb_mgr)
+    buttons_last = buttons
+
+
 def ecam32_create_events(xp, usb_mgr, display_mgr):
-    buttons_last = 0
     while True:
         if not xplane_connected:
             sleep(1)
@@ -370,27 +398,7 @@ def ecam32_create_events(xp, usb_mgr, display_mgr):
             print(f"[ECAM32] continue after usb-in error: {error}")
             sleep(0.5)
             continue
-
-        if len(data_in) not in VALID_REPORT_LENGTHS:
-            if len(data_in) != 0:
-                print(f"[ECAM32] rx data count {len(data_in)} not yet supported")
-            continue
-        if len(data_in) < REPORT_BUTTON_OFFSET + REPORT_BUTTON_BYTES:
-            continue
-
-        buttons = 0
-        for i in range(REPORT_BUTTON_BYTES):
-            buttons |= data_in[REPORT_BUTTON_OFFSET + i] << (8 * i)
-
-        for i in range(BUTTONS_CNT):
-            mask = 0x01 << i
-            if xor_bitmask(buttons, buttons_last, mask):
-                if buttons & mask:
-                    buttons_press_event[i] = 1
-                else:
-                    buttons_release_event[i] = 1
-                ecam_button_event(usb_mgr)
-        buttons_last = buttons
+        ecam32_read_report(usb_mgr, data_in)
 
 
 class device:
@@ -405,8 +413,7 @@ class device:
         print("[ECAM32] X-Plane connected")
         xplane_get_dataref_ids(self.xp)
         print("[ECAM32] subscribe datarefs ... ", end="")
-        t = Thread(target=self.xp.datarefs_subscribe, args=(self.xp.led_dataref_ids, xplane_ws_listener))
-        t.start()
+        self.xp.datarefs_subscribe(self.xp.led_dataref_ids, xplane_ws_listener, xp_websocket.led_array_indices(self.xp.led_dataref_ids, DREF_TYPE.ARRAY_0))
         print("done")
         xplane_connected = True
         xp = self.xp
@@ -435,5 +442,7 @@ class device:
 
         create_button_list_ecam32()
 
-        usb_event_thread = Thread(target=ecam32_create_events, args=[self.xp, self.usb_mgr, self.display_mgr])
-        usb_event_thread.start()
+        handler = lambda data_in: ecam32_read_report(self.usb_mgr, data_in)
+        if not hid_reactor.register(self.usb_mgr.path, handler, "ECAM32"):
+            usb_event_thread = Thread(target=ecam32_create_events, args=[self.xp, self.usb_mgr, self.display_mgr])
+            usb_event_thread.start()
@@ -6,6 +6,7 @@ from time import sleep
 
 import hid
 
+import hid_reactor
 import XPlaneUdp
 
 VERSION = 'V1.2+'
@@ -399,8 +400,10 @@ datarefs = [
 
 buttons_press_event = [0] * BUTTONS_CNT
 buttons_release_event = [0] * BUTTONS_CNT
+buttons_last = 0
 
 usb_retry = False
+values_dirty = True # all values are processed again after (re)connect
 
 xp = None
 
@@ -524,15 +527,17 @@ def create_button_list_fcu():
 
 def RequestDataRefs(xp):
     global datacache
+    subscriptions = []
     for idx,b in enumerate(buttonlist):
         datacache[b.dataref] = None
         if b.dreftype != DREF_TYPE.CMD and b.led != None:
             print(f"[FCU] dataref {b.dataref}")
-            xp.AddDataRef(b.dataref, 3)
+            subscriptions.append((b.dataref, 3))
     for d in datarefs:
         print(f"[FCU] register dataref {d[0]}")
         datacache[d[0]] = None
-        xp.AddDataRef(d[0], d[1])
+        subscriptions.append((d[0], d[1]))
+    xp.AddDataRefs(subscriptions)
 
 
 def xor_bitmask(a, b, bitmask):
@@ -598,43 +603,76 @@ def fcu_button_event(xp):
                 xp.WriteDataRef(b.dataref, 0)
 
 
+def fcu_process_changes(xp, usb_mgr, changes_cursor):
+    global values_dirty
+    if values_dirty: # datacache was cleared by RequestDataRefs, process all values once
+        values_dirty = False
+        xp.ResetCursor(changes_cursor)
+    changes = xp.GetChanges(changes_cursor) # only datarefs changed since the last loop
+    if 'sim/cockpit/autopilot/airspeed_is_mach' in changes and 'sim/cockpit2/autopilot/airspeed_dial_kts_mach' in xp.xplaneValues:
+        # speed scaling depends on the mach flag, process speed again after the flag
+        changes['sim/cockpit2/autopilot/airspeed_dial_kts_mach'] = changes.pop('sim/cockpit2/autopilot/airspeed_dial_kts_mach', xp.xplaneValues['sim/cockpit2/autopilot/airspeed_dial_kts_mach'])
+    set_datacache(usb_mgr, changes)
+    values_processed.set()
+
+
+def fcu_read_report(xp, data_in):
+    global buttons_last
+    if not xplane_connected: # buttons are ignored until x-plane is connected
+        return
+    if len(data_in) != 41:
+        if len(data_in) != 64:
+            if len(data_in) != 14:
+                print(f'rx data count {len(data_in)} not valid')
+        return
+    buttons=data_in[1] | (data_in[2] << 8) | (data_in[3] << 16) | (data_in[4] << 24) # FCU
+    if device_config & DEVICEMASK.EFISR:
+        buttons |= (data_in[9] << 32) | (data_in[10] << 40 ) | (data_in[11] << 48) | (data_in[12] << 56)
+    if device_config & DEVICEMASK.EFISL:
+        buttons |= (data_in[5] << 64) | (data_in[6] << 72 ) | (data_in[7] << 80) | (data_in[8] << 88)
+    for i in range (BUTTONS_CNT):
+        mask = 0x01 << i
+        if xor_bitmask(buttons, buttons_last, mask):
+            #print(f"buttons: {format(buttons, "#04x"):^14}")
+            if buttons & mask:
+                buttons_press_event[i] = 1
+            else:
+                buttons_release_event[i] = 1
+            fcu_button_event(xp)
+    buttons_last = buttons
+
+
+def fcu_update_values(xp, usb_mgr):
+        '''
+        Process the changed datarefs while the buttons are read by the hid_reactor.
+        '''
+        sleep(2) # wait for values to be available
+        changes_cursor = xp.ChangeCursor()
+        while True:
+            if not xplane_connected: # wait for x-plane
+                sleep(1)
+                continue
+
+            fcu_process_changes(xp, usb_mgr, changes_cursor)
+            sleep(0.005)
+
+
 def fcu_create_events(xp, usb_mgr):
-        global values
         sleep(2) # wait for values to be available
-        buttons_last = 0
+        changes_cursor = xp.ChangeCursor()
         while True:
             if not xplane_connected: # wait for x-plane
                 sleep(1)
                 continue
 
-            set_datacache(usb_mgr, values)
-            values_processed.set()
+            fcu_process_changes(xp, usb_mgr, changes_cursor)
             sleep(0.005)
             try:
                 data_in = usb_mgr.device.read(0x81, 105)
             except Exception as error:
                 print(f' *** continue after usb-in error: {error} ***')
                 continue
-            if len(data_in) != 41:
-                if len(data_in) != 64:
-                    if len(data_in) != 14:
-                        print(f'rx data count {len(data_in)} not valid')
-                continue
-            buttons=data_in[1] | (data_in[2] << 8) | (data_in[3] << 16) | (data_in[4] << 24) # FCU
-            if device_config & DEVICEMASK.EFISR:
-                buttons |= (data_in[9] << 32) | (data_in[10] << 40 ) | (data_in[11] << 48) | (data_in[12] << 56)
-            if device_config & DEVICEMASK.EFISL:
-                buttons |= (data_in[5] << 64) | (data_in[6] << 72 ) | (data_in[7] << 80) | (data_in[8] << 88)
-            for i in range (BUTTONS_CNT):
-                mask = 0x01 << i
-                if xor_bitmask(buttons, buttons_last, mask):
-                    #print(f"buttons: {format(buttons, "#04x"):^14}")
-                    if buttons & mask:
-                        buttons_press_event[i] = 1
-                    else:
-                        buttons_release_event[i] = 1
-                    fcu_button_event(xp)
-            buttons_last = buttons
+            fcu_read_report(xp, data_in)
 
 
 def set_button_led_lcd(device, dataref, v):
@@ -692,6 +730,8 @@ def set_datacache(usb_mgr, values):
         alt = datacache['sim/cockpit/autopilot/altitude']
         vs = datacache['sim/cockpit/autopilot/vertical_velocity']
         hdg = datacache['AirbusFBW/HDGTRKmode']
+        if None in (speed, heading, alt, vs):
+            return # not all values received yet, e.g. right after (re)connect
         if vs < 0:
             vs = abs(vs)
             flags['vs_vert'].value = False
@@ -802,6 +842,7 @@ class UsbManager:
     def __init__(self):
         self.device = None
         self.device_config = 0
+        self.path = None # hid.enumerate() path of the device, hidapi opens the first match of vid/pid
 
     def connect_device(self, vid: int, pid: int):
 
@@ -834,6 +875,7 @@ class UsbManager:
                 if dev['vendor_id'] == d['vid'] and dev['product_id'] == d['pid']:
                     print("found")
                     self.device_config |= d['mask']
+                    self.path = dev['path']
                     return d['vid'], d['pid'], self.device_config
             print("not found")
         return None, None, 0
@@ -844,19 +886,18 @@ class device:
         self.xp = xp
         self.cyclic = Event()
 
-        self.xp = XPlaneUdp.XPlaneUdp()
-        self.xp.BeaconData["IP"] = UDP_IP # workaround to set IP and port
-        self.xp.BeaconData["Port"] = UDP_PORT
-        self.xp.UDP_PORT = self.xp.BeaconData["Port"]
+        self.xp = XPlaneUdp.shared_hub(UDP_IP, UDP_PORT).Subscriber("FCU")
 
 
     def connected(self):
         global xplane_connected
+        global values_dirty
 
         if not device_config:
             return
         print(f"[FCU] X-Plane connected")
         RequestDataRefs(self.xp)
+        values_dirty = True
         xplane_connected = True
 
 
@@ -908,7 +949,11 @@ class device:
     
         startupscreen(self.usb_mgr.device, device_config, version, new_version)
 
-        usb_event_thread = Thread(target=fcu_create_events, args=[self.xp, self.usb_mgr])
+        handler = lambda data_in: fcu_read_report(self.xp, data_in)
+        if hid_reactor.register(self.usb_mgr.path, handler, "FCU"):
+            usb_event_thread = Thread(target=fcu_update_values, args=[self.xp, self.usb_mgr])
+        else:
+            usb_event_thread = Thread(target=fcu_create_events, args=[self.xp, self.usb_mgr])
         usb_event_thread.start()
 
         cyclic_thread = Thread(target=self.cyclic_worker)
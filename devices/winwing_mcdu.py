@@ -1,12 +1,24 @@
+import base64
 from dataclasses import dataclass
 from enum import Enum, IntEnum
+import sys
 
-from threading import Thread, Event
-from time import sleep
+from threading import Thread, Event, Lock, RLock
+from time import monotonic, sleep
 
 import hid
 
+import hid_reactor
 import XPlaneUdp
+import xp_websocket
+
+MCDU_DATA_SOURCE = "udp" # "websocket": text datarefs as whole byte arrays over the X-Plane web API instead of one RREF per character
+MCDU_MAX_FPS = 20 # display pushes per second at most
+MCDU_SETTLE_TIME = 0.03 # s without updates before a page is drawn, a page change arrives in several datagrams
+MCDU_SETTLE_MAX = 0.15 # s, a page is drawn at the latest after this time even if updates keep coming
+RENDER_REPORT_INTERVAL = 60 # s, print the rendered frames vs. received updates (None: never)
+MCDU_CONSOLE_MIRROR = None # print the MCDU screen to the console, None: only if stdout is a terminal
+MCDU_CONSOLE_FPS = 2 # console screens per second at most
 
 BUTTONS_CNT = 99 # TODO
 PAGE_LINES = 14 # Header + 6 * label + 6 * cont + textbox
@@ -14,6 +26,19 @@ PAGE_CHARS_PER_LINE = 24
 PAGE_BYTES_PER_CHAR = 3
 PAGE_BYTES_PER_LINE = PAGE_CHARS_PER_LINE * PAGE_BYTES_PER_CHAR
 PAGE_BYTES_PER_PAGE = PAGE_BYTES_PER_LINE * PAGE_LINES
+REPORT_DATA_LEN = 63 # display data per hid report, after the 0xf2 report id
+
+ARROW_UP = '\u2191'
+ARROW_DOWN = '\u2193'
+# characters the display gets as utf-8 symbol
+CHAR_CODES = {
+    '#': bytes([0xe2, 0x98, 0x90]), # box
+    '<': bytes([0xe2, 0x86, 0x90]),
+    '>': bytes([0xe2, 0x86, 0x92]),
+    '`': bytes([0xc2, 0xb0]), # °
+    ARROW_UP: bytes([0xe2, 0x86, 0x91]),
+    ARROW_DOWN: bytes([0xe2, 0x86, 0x93]),
+}
 
 #@unique
 class DEVICEMASK(IntEnum):
@@ -71,13 +96,10 @@ class Button:
 
 values_processed = Event()
 xplane_connected = False
-buttonlist = []
-values = []
+values = {}
 
 led_brightness = 180
 
-device_config = DEVICEMASK.NONE
-
 
 class Byte(Enum):
     H0 = 0
@@ -126,6 +148,9 @@ class DisplayManager:
     def __init__(self, device):
         self.device = device
         self.page = [[' ' for _ in range(PAGE_BYTES_PER_LINE)] for _ in range(PAGE_LINES)]
+        self.glyphs = {} # key = (color, font_small, char), value = encoded bytes
+        self.line_cache = [None] * PAGE_LINES # per line (line content, vertslew_key), encoded bytes
+        self.lock = RLock() # one writer on the device at a time
         device.write(bytes([0xf0, 0x0, 0x1, 0x38, 0x32, 0xbb, 0x0, 0x0, 0x1e, 0x1, 0x0, 0x0, 0xc4, 0x24, 0xa, 0x0, 0x0, 0x0, 0x0, 0x0, 0x0, 0x32, 0xbb, 0x0, 0x0, 0x18, 0x1, 0x0, 0x0, 0xc4, 0x24, 0xa, 0x0, 0x0, 0x8, 0x0, 0x0, 0x0, 0x34, 0x0, 0x18, 0x0, 0xe, 0x0, 0x18, 0x0, 0x32, 0xbb, 0x0, 0x0, 0x19, 0x1, 0x0, 0x0, 0xc4, 0x24, 0xa, 0x0, 0x0, 0xe, 0x0, 0x0, 0x0, 0x0]))
         device.write(bytes([0xf0, 0x0, 0x2, 0x38, 0x0, 0x0, 0x0, 0x1, 0x0, 0x5, 0x0, 0x0, 0x0, 0x2, 0x0, 0x0, 0x0, 0x0, 0x0, 0x0, 0x0, 0x32, 0xbb, 0x0, 0x0, 0x19, 0x1, 0x0, 0x0, 0xc4, 0x24, 0xa, 0x0, 0x0, 0xe, 0x0, 0x0, 0x0, 0x1, 0x0, 0x6, 0x0, 0x0, 0x0, 0x3, 0x0, 0x0, 0x0, 0x0, 0x0, 0x0, 0x0, 0x32, 0xbb, 0x0, 0x0, 0x19, 0x1, 0x0, 0x0, 0x0, 0x0, 0x0, 0x0]))
         device.write(bytes([0xf0, 0x0, 0x3, 0x38, 0x76, 0x72, 0x19, 0x0, 0x0, 0xe, 0x0, 0x0, 0x0, 0x2, 0x0, 0x0, 0x0, 0x0, 0xff, 0x4, 0x0, 0x0, 0x0, 0x0, 0x0, 0x0, 0x0, 0x32, 0xbb, 0x0, 0x0, 0x19, 0x1, 0x0, 0x0, 0x76, 0x72, 0x19, 0x0, 0x0, 0xe, 0x0, 0x0, 0x0, 0x2, 0x0, 0x0, 0xa5, 0xff, 0xff, 0x5, 0x0, 0x0, 0x0, 0x0, 0x0, 0x0, 0x0, 0x32, 0xbb, 0x0, 0x0, 0x0, 0x0]))
@@ -172,59 +197,72 @@ class DisplayManager:
 
     def clear(self):
         blank_line = [0xf2] + [0x42, 0x00, ord(' ')] * PAGE_CHARS_PER_LINE
-        for _ in range(16):
-            self.device.write(bytes(blank_line))
+        with self.lock:
+            for _ in range(16):
+                self.device.write(bytes(blank_line))
 
     def write_line_repeated(self, text: str, repeat: int = 16):
         encoded = [ord(c) for c in text]
         c = 0
-        for _ in range(repeat):
-            buf = [0xf2]
-            for _ in range(21):
-                buf.extend([0x42, 0x00, encoded[c]])
-                c = (c + 1) % len(encoded)
-            self.device.write(bytes(buf))
+        with self.lock:
+            for _ in range(repeat):
+                buf = [0xf2]
+                for _ in range(21):
+                    buf.extend([0x42, 0x00, encoded[c]])
+                    c = (c + 1) % len(encoded)
+                self.device.write(bytes(buf))
+
+    def _glyph(self, color, font_small, char):
+        '''
+        Encoded cell: color and font (2 bytes) and the character (1 to 3 bytes).
+        '''
+        key = (color, font_small, char)
+        glyph = self.glyphs.get(key)
+        if glyph is None:
+            data_low, data_high = self._data_from_col_font(color, font_small)
+            code = CHAR_CODES.get(char)
+            if code is None:
+                code = bytes([ord(char)])
+            glyph = self.glyphs[key] = bytes([data_low, data_high]) + code
+        return glyph
+
+    def _encode_line(self, i, line, vertslew_key):
+        key = (tuple(line), vertslew_key)
+        cached = self.line_cache[i]
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        glyphs = []
+        for j in range(PAGE_CHARS_PER_LINE):
+            pos = j * PAGE_BYTES_PER_CHAR
+            char = line[pos + PAGE_BYTES_PER_CHAR - 1]
+            if vertslew_key and char not in CHAR_CODES:
+                if j == PAGE_CHARS_PER_LINE - 2 and (vertslew_key == 1 or vertslew_key == 2):
+                    char = ARROW_UP
+                elif j == PAGE_CHARS_PER_LINE - 1 and (vertslew_key == 1 or vertslew_key == 3):
+                    char = ARROW_DOWN
+            glyphs.append(self._glyph(line[pos], line[pos + 1], char))
+        encoded = b''.join(glyphs)
+        self.line_cache[i] = (key, encoded)
+        return encoded
 
     def set_from_page(self, page = None, vertslew_key = 0):
         if page == None: # use internal page
             page = self.page
-        buf = []
+        buf = bytearray()
         for i in range(PAGE_LINES):
-            for j in range(PAGE_CHARS_PER_LINE):
-                color = page[i][j * PAGE_BYTES_PER_CHAR]
-                font_small = page[i][j * PAGE_BYTES_PER_CHAR + 1]
-                data_low, data_high = self._data_from_col_font(color, font_small)
-                buf.append(data_low)
-                buf.append(data_high)
-                val = ord(page[i][j * PAGE_BYTES_PER_CHAR + PAGE_BYTES_PER_CHAR - 1])
-                if val == 35: # #
-                    buf.extend([0xe2, 0x98, 0x90])
-                elif val == 60: # <
-                    buf.extend([0xe2, 0x86, 0x90])
-                elif val == 62: # >
-                    buf.extend([0xe2, 0x86, 0x92])
-                elif val == 96: # °
-                    buf.extend([0xc2, 0xb0])
-                #elif val == "A": # down arrow
-                #    buf.extend([0xe2, 0x86, 0x93])
-                #elif val == "ö": # up arrow
-                #    buf.extend([0xe2, 0x86, 0x91])
-                else:
-                    if i == PAGE_LINES - 1 and j == PAGE_CHARS_PER_LINE - 2 and (vertslew_key == 1 or vertslew_key == 2):
-                        buf.extend([0xe2, 0x86, 0x91])
-                    elif i == PAGE_LINES - 1 and j == PAGE_CHARS_PER_LINE - 1 and (vertslew_key == 1 or vertslew_key == 3):
-                        buf.extend([0xe2, 0x86, 0x93])
-                    else:
-                        buf.append(val)
-
-        while len(buf):
-            max_len = min(63, len(buf))
-            usb_buf = buf[:max_len]
-            usb_buf.insert(0, 0xf2)
-            if max_len < 63:
-                usb_buf.extend([0] * (63 - max_len))
-            self.device.write(bytes(usb_buf))
-            del buf[:max_len]
+            # slew arrows are drawn into the last line only
+            buf += self._encode_line(i, page[i], vertslew_key if i == PAGE_LINES - 1 else 0)
+
+        data = memoryview(buf)
+        report = bytearray(1 + REPORT_DATA_LEN)
+        report[0] = 0xf2
+        with self.lock:
+            for start in range(0, len(data), REPORT_DATA_LEN):
+                chunk = data[start:start + REPORT_DATA_LEN]
+                report[1:1 + len(chunk)] = chunk
+                if len(chunk) < REPORT_DATA_LEN:
+                    report[1 + len(chunk):] = bytes(REPORT_DATA_LEN - len(chunk))
+                self.device.write(bytes(report))
 
     def write_line_to_page(self, line, pos, text: str, color: str = 'W', font_small: bool = False):
         if line < 0 or line >= PAGE_LINES:
@@ -243,9 +281,155 @@ class DisplayManager:
             self.page[line][pos + c * PAGE_BYTES_PER_CHAR + 1] = font_small
             self.page[line][pos + c * PAGE_BYTES_PER_CHAR + PAGE_BYTES_PER_CHAR - 1] = text[c]
 
+class RenderScheduler:
+
+    '''
+    Draws the MCDU page from its own thread. Updates are merged, the latest page wins.
+    A page is drawn when no update came for MCDU_SETTLE_TIME (at the latest after
+    MCDU_SETTLE_MAX) and at most MCDU_MAX_FPS times per second, so a page change
+    arriving in several datagrams is one push without the half-built pages.
+    '''
+
+    def __init__(self, display_mgr):
+        self.display_mgr = display_mgr
+        self.lock = Lock()
+        self.event = Event()
+        self.pending = None # (page, vertslew_key) not drawn yet
+        self.last_update = 0.0
+        self.updates = 0 # pages requested
+        self.frames = 0 # pages drawn
+        self.thread = Thread(target=self._writer, daemon=True)
+        self.thread.start()
+
+    def request(self, page, vertslew_key):
+        snapshot = [line[:] for line in page] # the page is changed in place by the caller
+        with self.lock:
+            self.pending = (snapshot, vertslew_key)
+            self.last_update = monotonic()
+            self.updates += 1
+        self.event.set()
+
+    def cancel(self):
+        '''
+        Drop a page not drawn yet, e.g. before drawing the startup screen.
+        '''
+        with self.lock:
+            self.pending = None
+
+    def summary(self):
+        with self.lock:
+            return {"updates": self.updates, "frames": self.frames}
+
+    def _writer(self):
+        last_frame = 0.0
+        last_report = monotonic()
+        reported = (0, 0)
+        while True:
+            self.event.wait(RENDER_REPORT_INTERVAL)
+            self.event.clear()
+            start = monotonic()
+            while True:
+                # wait until the page settled
+                now = monotonic()
+                with self.lock:
+                    quiet = now - self.last_update
+                if quiet >= MCDU_SETTLE_TIME or now - start >= MCDU_SETTLE_MAX:
+                    break
+                sleep(min(MCDU_SETTLE_TIME - quiet, MCDU_SETTLE_MAX - (now - start)))
+            wait = last_frame + 1 / MCDU_MAX_FPS - monotonic()
+            if wait > 0:
+                sleep(wait)
+            with self.display_mgr.lock: # cancel() before other writes to the display drops the page
+                with self.lock:
+                    pending = self.pending
+                    self.pending = None
+                if pending is not None:
+                    self.display_mgr.set_from_page(*pending)
+                    last_frame = monotonic()
+                    with self.lock:
+                        self.frames += 1
+
+            if RENDER_REPORT_INTERVAL and monotonic() - last_report >= RENDER_REPORT_INTERVAL:
+                updates, frames = self.updates, self.frames
+                if updates != reported[0]:
+                    print(f"[MCDU] {frames - reported[1]} frames rendered for {updates - reported[0]} updates in the last {monotonic() - last_report:.0f} s")
+                reported = (updates, frames)
+                last_report = monotonic()
+
+
+# characters shown differently in the console
+CONSOLE_CHARS = str.maketrans({'#': '☐', '`': '°', '>': '🠊', '<': '🠈'})
+
+class ConsoleMirror:
+
+    '''
+    Prints the MCDU screen to the console from its own thread, as one write per
+    screen and at most MCDU_CONSOLE_FPS times per second. Pages in between are skipped.
+    '''
+
+    def __init__(self, out = sys.stdout):
+        self.out = out
+        self.lock = Lock()
+        self.event = Event()
+        self.pending = None # (page, vertslew_key) not printed yet
+        self.thread = Thread(target=self._writer, daemon=True)
+        self.thread.start()
+
+    def request(self, page, vertslew_key):
+        text = ["".join(line[PAGE_BYTES_PER_CHAR - 1::PAGE_BYTES_PER_CHAR]) for line in page]
+        with self.lock:
+            self.pending = (text, vertslew_key)
+        self.event.set()
+
+    def render(self, text, vertslew_key):
+        up = '🠉' if vertslew_key == 1 or vertslew_key == 2 else '-'
+        down = '🠋' if vertslew_key == 1 or vertslew_key == 3 else '-'
+        lines = ["|------ MCDU SCREEN -----|"]
+        lines.extend(f"|{line.translate(CONSOLE_CHARS)}|" for line in text)
+        lines.append(f"|----------------------{up}{down}|")
+        return "\n".join(lines) + "\n\n"
+
+    def _writer(self):
+        while True:
+            self.event.wait()
+            self.event.clear()
+            with self.lock:
+                pending = self.pending
+                self.pending = None
+            if pending is None:
+                continue
+            self.out.write(self.render(*pending))
+            self.out.flush()
+            sleep(1 / MCDU_CONSOLE_FPS)
+
+
+console_mirror = None # ConsoleMirror if enabled, see MCDU_CONSOLE_MIRROR
+
 mcdu_device = None # usb /dev/inputx device
 
-datacache = {}
+# kinds of the entries in page_cells
+CELL_TEXT = 0 # character with fixed color
+CELL_SYMBOL = 1 # symbol dataref (color s), the character selects symbol and color
+CELL_SPW = 2 # white scratchpad
+CELL_SPA = 3 # amber scratchpad
+CELL_VERTSLEW = 4 # vertical slew keys
+
+# symbol character -> (character, color) for the symbol datarefs
+SYMBOLS = {
+    ord('A'): (91, 'b'), # '[', should be blue
+    ord('B'): (93, 'b'), # ']', should be blue
+    ord('0'): (60, 'b'), # '<', should be a small blue arrow
+    ord('1'): (62, 'b'), # '>', should be a small blue arrow
+    ord('2'): (60, 'w'), # '<', should be a small white arrow in title
+    ord('3'): (62, 'w'), # '>', should be a small white arrow in title
+    ord('4'): (60, 'a'), # '<', should be a small orange arrow in cont
+    ord('5'): (62, 'a'), # '>'
+    ord('E'): (35, 'a'), # '#', should be an orange box
+}
+SYMBOLS_LARGE = {val: (char, color.upper()) for val, (char, color) in SYMBOLS.items()}
+
+page_cells = {} # key = side (1, 2), value = dict subscribed dataref -> (line, column, color, font_small, kind), built in RequestDataRefs
+led_datarefs = [] # subscribed datarefs of button leds and brightness
 
 # List of datarefs without led connection to request.
 # Text Dataref format:  <MCDU[1,2]><Line[title/label/cont/etc]><Linenumber[1...6]><Color[a,b,m,s,w,y]>.
@@ -386,13 +570,13 @@ datarefs = [
     ("AirbusFBW/MCDU1VertSlewKeys", None)
   ]
 
-buttons_press_event = [0] * BUTTONS_CNT
-buttons_release_event = [0] * BUTTONS_CNT
 
 usb_retry = False
+page_dirty = True # redraw even without dataref changes
 
 
-def create_button_list_mcdu():
+def create_button_list_mcdu(config = DEVICEMASK.NONE):
+    buttonlist = []
     buttonlist.append(Button(0, "LSK1L", "AirbusFBW/MCDU1LSK1L", DrefType.CMD, ButtonType.TOGGLE))
     buttonlist.append(Button(1, "LSK2L", "AirbusFBW/MCDU1LSK2L", DrefType.CMD, ButtonType.TOGGLE))
     buttonlist.append(Button(2, "LSK3L", "AirbusFBW/MCDU1LSK3L", DrefType.CMD, ButtonType.TOGGLE))
@@ -469,6 +653,9 @@ def create_button_list_mcdu():
     buttonlist.append(Button(73, "Clear", "AirbusFBW/MCDU1KeyClear", DrefType.CMD, ButtonType.TOGGLE))
     buttonlist.append(Button(75, "LCDBright", "AirbusFBW/DUBrightness[6]", DrefType.DATA, ButtonType.NONE, Leds.SCREEN_BACKLIGHT))
     buttonlist.append(Button(75, "Backlight", "ckpt/fped/lights/mainPedLeft/anim", DrefType.DATA, ButtonType.NONE, Leds.BACKLIGHT))
+    for b in buttonlist:
+        b.dataref = dataref_switch_mcdu(b.dataref, config)
+    return buttonlist
 
 
 def dataref_switch_mcdu(dataref, config):
@@ -477,43 +664,175 @@ def dataref_switch_mcdu(dataref, config):
     return dataref
 
 
-def RequestDataRefs(xp, config):
-    dataref_cnt = 0
-    for idx,b in enumerate(buttonlist):
-        datacache[dataref_switch_mcdu(b.dataref, config)] = None
-        if b.dreftype != DrefType.CMD and b.led != None:
-            print(f"[MCDU] register dataref {b.dataref}")
-            xp.AddDataRef(b.dataref, 3)
-            dataref_cnt += 1
-    print(f"[MCDU] register array datarefs ", end='' )
+def dataref_side(dataref, side):
+    return dataref.replace('AirbusFBW/MCDU1', f'AirbusFBW/MCDU{side}')
+
+
+def page_cell(dataref, index = None):
+    '''
+    Where a value of an MCDU1 dataref goes on the page: (line, column, color, font_small, kind),
+    None if it is not shown. For CELL_SYMBOL color is the SYMBOLS table to use.
+    '''
+    name = dataref.split('/')[-1]
+    if "VertSlewKeys" in name:
+        return (None, None, None, None, CELL_VERTSLEW)
+    if "MCDU1spw" in name:
+        return (PAGE_LINES - 1, index, 'w', 0, CELL_SPW)
+    if "MCDU1spa" in name:
+        if index > 21: # prevent amber color on vert slew keys
+            return None
+        return (PAGE_LINES - 1, index, 'a', 0, CELL_SPA)
+
+    color = name[-1]
+    font_small = 1 # 0 .. normal, 1 .. small
+    if "MCDU1title" in name or "MCDU1stitle" in name:
+        line = 0
+        if "stitle" not in name:
+            font_small = 0 # normal
+    elif "MCDU1label" in name:
+        line = int(name.split('label')[1][0]) * 2 - 1
+        if name[-2] == 'L':
+            font_small = 0 # normal
+    elif "MCDU1cont" in name or "MCDU1scont" in name:
+        line = int(name.split('cont')[1][0]) * 2
+        if "scont" not in name:
+            font_small = 0 # normal
+    else:
+        return None
+
+    large = "MCDU1s" not in name # convert y in Y, a in A, ... if not small font
+    if color == 's':
+        return (line, index, SYMBOLS_LARGE if large else SYMBOLS, font_small, CELL_SYMBOL)
+    return (line, index, color.upper() if large else color, font_small, CELL_TEXT)
+
+
+class McduWebsocketSource:
+
+    '''
+    MCDU text datarefs as whole byte arrays over the X-Plane web API: one value per
+    line and color instead of 24 RREF values. Changed characters are passed on as the
+    values of the RREF source (e.g. AirbusFBW/MCDU1cont1b[3]), so the page assembly
+    is the same for both sources.
+    '''
+
+    def __init__(self):
+        self.xp = xp_websocket.XP_Websocket()
+        self.lock = Lock()
+        self.arrays = {} # key = dataref id, value = [per character datarefs, last received text]
+        self.values = {} # key = per character dataref, value = character
+        self.changes = {} # changed values since the last GetChanges
+
+    def subscribe(self, datarefs):
+        ids = self.xp.dataref_ids_fetch(datarefs)
+        with self.lock:
+            self.arrays = {id: [[f"{dataref}[{i}]" for i in range(PAGE_CHARS_PER_LINE)], None]
+                           for dataref, id in ids.items() if id is not None}
+            self.values = {}
+            self.changes = {}
+        for dataref, id in ids.items():
+            if id is None:
+                print(f"[MCDU] dataref {dataref} not found")
+        self.xp.datarefs_subscribe(list(self.arrays), self._listener)
+
+    def GetChanges(self):
+        with self.lock:
+            changes = self.changes
+            self.changes = {}
+        return changes
+
+    def GetValues(self):
+        with self.lock:
+            return dict(self.values)
+
+    def _listener(self, data, dataref_list):
+        if data.get("type") != "dataref_update_values":
+            if data.get("type") == "result" and data.get("success") is not True:
+                print(f"[MCDU] websocket request failed: {data}")
+            return
+        with self.lock:
+            for ref_id, value in data["data"].items():
+                array = self.arrays.get(ref_id)
+                if array is None:
+                    continue
+                names, last = array
+                # byte arrays are base64 encoded, pad to a full line like the RREF values
+                if type(value) is str:
+                    text = base64.b64decode(value)
+                elif type(value) is list:
+                    text = bytes(int(c) for c in value)
+                else:
+                    continue
+                text = text[:PAGE_CHARS_PER_LINE].ljust(PAGE_CHARS_PER_LINE, b'\0')
+                if text == last:
+                    continue
+                for i, c in enumerate(text):
+                    if last is None or last[i] != c:
+                        self.values[names[i]] = self.changes[names[i]] = float(c)
+                array[1] = text
+
+
+def RequestDataRefs(xp, units, text_source = None):
+    '''
+    Subscribe the datarefs of all MCDU units on xp, a dataref needed by several units
+    only once. The text datarefs go to text_source (McduWebsocketSource) if given.
+    The cells of a text dataref are parsed once and shared by both sides.
+    '''
+    subscriptions = {} # key = dataref, value = freq
+    page_cells.clear()
+    led_datarefs.clear()
+    sides = sorted({unit.side for unit in units})
+    for unit in units:
+        unit.datacache = {}
+        for b in unit.buttonlist:
+            unit.datacache[b.dataref] = None
+            if b.dreftype != DrefType.CMD and b.led != None and b.dataref not in subscriptions:
+                print(f"[MCDU] register dataref {b.dataref}")
+                subscriptions[b.dataref] = 3
+                led_datarefs.append(b.dataref)
+    for side in sides:
+        page_cells[side] = {}
+    print(f"[MCDU] register array datarefs for MCDU {', '.join(str(side) for side in sides)}")
     for d in array_datarefs:
+        freq = d[1]
+        if freq == None:
+            freq = 2
         for i in range(PAGE_CHARS_PER_LINE):
-            freq = d[1]
-            if freq == None:
-                freq = 2
-            xp.AddDataRef(dataref_switch_mcdu(d[0]+'['+str(i)+']', config), freq)
-            dataref_cnt += 1
-            if dataref_cnt % 100 == 0:
-                print(".", end='', flush=True)
-
-    print("")
+            cell = page_cell(d[0], i)
+            for side in sides:
+                dataref = dataref_side(d[0]+'['+str(i)+']', side)
+                if text_source is None:
+                    subscriptions[dataref] = freq
+                if cell:
+                    page_cells[side][dataref] = cell
+    if text_source is not None:
+        text_source.subscribe([dataref_side(d[0], side) for side in sides for d in array_datarefs])
+        print(f"[MCDU] registered {len(array_datarefs) * len(sides)} text datarefs on the websocket")
+
     for d in datarefs:
         print(f"[MCDU] register dataref {d[0]}")
         freq = d[1]
         if freq == None:
             freq = 2
-        xp.AddDataRef(dataref_switch_mcdu(d[0], config), freq)
-        dataref_cnt += 1
-    print(f"[MCDU] registered {dataref_cnt} datarefs")
+        cell = page_cell(d[0])
+        for side in sides:
+            dataref = dataref_side(d[0], side)
+            subscriptions[dataref] = freq
+            if cell:
+                page_cells[side][dataref] = cell
+    xp.AddDataRefs(list(subscriptions.items()))
+    print(f"[MCDU] registered {len(subscriptions)} datarefs")
 
 
 def xor_bitmask(a, b, bitmask):
     return (a & bitmask) != (b & bitmask)
 
 
-def mcdu_button_event(xp):
+def mcdu_button_event(xp, unit):
+    buttons_press_event = unit.buttons_press_event
+    buttons_release_event = unit.buttons_release_event
+    datacache = unit.datacache
     #print(f'events: press: {buttons_press_event}, release: {buttons_release_event}')
-    for b in buttonlist:
+    for b in unit.buttonlist:
 
         if not any(buttons_press_event) and not any(buttons_release_event):
             break
@@ -522,9 +841,6 @@ def mcdu_button_event(xp):
         if buttons_press_event[b.id]:
             buttons_press_event[b.id] = 0
 
-            if device_config & DEVICEMASK.FO:
-                b.dataref = b.dataref.replace('AirbusFBW/MCDU1', 'AirbusFBW/MCDU2')
-
             #print(f'button {b.label} pressed')
             if b.type == ButtonType.TOGGLE:
                 val = datacache[b.dataref]
@@ -575,18 +891,81 @@ def mcdu_button_event(xp):
                 xp.WriteDataRef(b.dataref, 0)
 
 
-def mcdu_create_events(xp, usb_mgr, display_mgr):
+def mcdu_update_pages(xp, units, text_source = None):
+        '''
+        Update the pages of the aircraft MCDUs in use from the changed values,
+        for all units in one thread.
+        '''
         global values
+        global page_dirty
         sleep(2) # wait for values to be available
-        buttons_last = 0
+        changes_cursor = xp.ChangeCursor()
         while True:
             if not xplane_connected: # wait for x-plane
                 sleep(1)
                 continue
 
-            set_datacache(usb_mgr, display_mgr, values.copy())
+            # the pages are updated from the changed values, rebuilt from all values after (re)connect
+            changes = xp.GetChanges(changes_cursor)
+            if text_source is not None:
+                changes.update(text_source.GetChanges())
+            if page_dirty and values: # keep it dirty until the first values are received
+                page_dirty = False
+                page_models.clear()
+                for side, cells in page_cells.items():
+                    page_models[side] = McduPage()
+                    page_models[side].reset(cells)
+                changes = values.copy()
+                if text_source is not None:
+                    changes.update(text_source.GetValues())
+            if changes or usb_retry:
+                set_datacache(units, changes)
             values_processed.set()
             sleep(0.005)
+
+
+def mcdu_read_report(xp, unit, data_in):
+    '''
+    Create the button events of one input report of unit.
+    '''
+    if not xplane_connected: # buttons are ignored until x-plane is connected
+        return
+    if len(data_in) == 14: # we get this often but don't understand yet. May have someting to do with leds set
+        return
+    if len(data_in) != 25:
+        print(f'[MCDU] rx data count {len(data_in)} not valid for {unit.name}')
+        return
+    #print(f"data_in: {data_in}")
+
+    #create button bit-pattern
+    buttons = 0
+    for i in range(12):
+        buttons |= data_in[i + 1] << (8 * i)
+    #print(hex(buttons)) # TEST2: you should see a difference when pressing buttons
+    buttons_last = unit.buttons_last
+    for i in range (BUTTONS_CNT):
+        mask = 0x01 << i
+        if xor_bitmask(buttons, buttons_last, mask):
+            #print(f"buttons: {format(buttons, "#04x"):^14}")
+            if buttons & mask:
+                unit.buttons_press_event[i] = 1
+            else:
+                unit.buttons_release_event[i] = 1
+            mcdu_button_event(xp, unit)
+    unit.buttons_last = buttons
+
+
+def mcdu_create_events(xp, unit):
+        '''
+        Read the input reports of unit in a loop, used without the hid_reactor.
+        '''
+        usb_mgr = unit.usb_mgr
+        while True:
+            if not xplane_connected: # wait for x-plane
+                sleep(1)
+                continue
+
+            sleep(0.005)
             #print('#', end='', flush=True) # TEST1: should print many '#' in console
             try:
                 data_in = usb_mgr.device.read(0x81, 25)
@@ -594,31 +973,10 @@ def mcdu_create_events(xp, usb_mgr, display_mgr):
                 print(f'[MCDU]  *** continue after usb-in error: {error} ***') # TODO
                 sleep(0.5) # TODO remove
                 continue
-            if len(data_in) == 14: # we get this often but don't understand yet. May have someting to do with leds set
-                continue
-            if len(data_in) != 25:
-                print(f'[MCDU] rx data count {len(data_in)} not valid for {usb_mgr}')
-                continue
-            #print(f"data_in: {data_in}")
-
-            #create button bit-pattern
-            buttons = 0
-            for i in range(12):
-                buttons |= data_in[i + 1] << (8 * i)
-            #print(hex(buttons)) # TEST2: you should see a difference when pressing buttons
-            for i in range (BUTTONS_CNT):
-                mask = 0x01 << i
-                if xor_bitmask(buttons, buttons_last, mask):
-                    #print(f"buttons: {format(buttons, "#04x"):^14}")
-                    if buttons & mask:
-                        buttons_press_event[i] = 1
-                    else:
-                        buttons_release_event[i] = 1
-                    mcdu_button_event(xp)
-            buttons_last = buttons
-
-
-def set_button_led_lcd(ep, dataref, v):
+            mcdu_read_report(xp, unit, data_in)
+
+
+def set_button_led_lcd(ep, buttonlist, dataref, v):
     global led_brightness
     for b in buttonlist:
         if b.dataref == dataref:
@@ -631,198 +989,164 @@ def set_button_led_lcd(ep, dataref, v):
             winwing_mcdu_set_leds(ep, b.led, int(v))
             break
 
-page = [[' ' for i in range(0, PAGE_BYTES_PER_LINE)] for j in range(0, PAGE_LINES)]
-
-def set_datacache(usb_mgr, display_mgr, values):
-    global datacache
-    global page
-    new = False
-
-    vertslew_key = None
-    page_tmp = [[' ' for i in range(0, PAGE_BYTES_PER_LINE)] for j in range(0, PAGE_LINES)]
-    spw_line = [0] * PAGE_BYTES_PER_LINE
-    spa_line = [0] * PAGE_BYTES_PER_LINE
-    for v in values:
-        pos = 0
-        val = int(values[v])
-        data_valid = False
-
-        if "DUBrightness" in v and values[v] <= 1:
-            # brightness is in 0..1, we need 0..255
-            values[v] = int(values[v] * 255)
-        if "/anim" in v and values[v] > 255:
-            # brightness is in 0..270, we need 0..255
-            values[v] = 255
-
-        #write leds ob buttons (also NONE Buttons)
-        if "DUBrightness" in v or "/anim" in v:
-            if datacache[v] != int(values[v]):
-                print(f'cache: v:{v} val:{int(values[v])}')
-                datacache[v] = int(values[v])
-                set_button_led_lcd(usb_mgr.device, v, int(values[v]))
-
-
-        color = v.split('[')[0][-1]
-        font_small = 1 # 0 .. normal, 1 .. small
-        if ('cont' in v and not 'scont' in v) or 'spw' in v:
-            font_small = 0 # normal
-        if ('title' in v and not 'stitle' in v) or 'spa' in v:
-            font_small = 0 # normal
+BLANK_CELL = (' ', ' ', ' ') # color, font_small, char of a cell without data
 
-        if usb_mgr.device_config & DEVICEMASK.FO:
-            v = v.replace('MCDU2', 'MCDU1')
+class McduPage:
 
-        #print(f"page: v:{v} val:{val},'{chr(val)}', col:{color}")
-        if val == 0x0 or (val == 0x20 and not 'MCDU1spw' in v and not 'MCDU1spa' in v):
-            continue
-        if color == 's':
-            if chr(val) == 'A':
-                val = 91 # '[', should be blue
-                color = 'b'
-            if chr(val) == 'B':
-                val = 93 # ']', should be blue
-                color = 'b'
-            if chr(val) == '0':
-                val = 60 # '<', should be a small blue arrow
-                color = 'b'
-            if chr(val) == '1':
-                val = 62 # '>', should be a small bluearrow
-                color = 'b'
-            if chr(val) == '2':
-                val = 60 # '<', should be a small white arrow in title
-                color = 'w'
-            if chr(val) == '3':
-                val = 62 # '>', should be a small white arrow in title
-                color = 'w'
-            if chr(val) == '4':
-                val = 60 # '<', should be a small orange arrow in cont
-                color = 'a'
-            if chr(val) == '5':
-                val = 62 # '>'
-                color = 'a'
-            if chr(val) == 'E':
-                val = 35 # '#', should be an orange box
-                color = 'a'
-            #print(f"page: v:{v} val:{val},'{chr(val)}', col:{color}")
-        if "MCDU1title" in v or "MCDU1stitle" in v:
-            pos = int(v.split('[')[1].split(']')[0])
-            line = 0
-            data_valid = True
-        if "MCDU1label" in v:
-            line = int(v.split('label')[1][0]) * 2 - 1
-            pos = int(v.split('[')[1].split(']')[0])
-            data_valid = True
-            if v.split('[')[0][-2] == 'L':
-                font_small = 0 # normal
-        if "MCDU1cont" in v or "MCDU1scont" in v: # and color == 'w':
-            line = int(v.split('cont')[1][0]) * 2
-            pos = int(v.split('[')[1].split(']')[0])
-            data_valid = True
-        spw_spa_data = False
-        if "MCDU1spw" in v: # and color == 'w':
-            pos = int(v.split('[')[1].split(']')[0])
-
-            spw_line[pos] = val
-            continue
+    '''
+    Persistent MCDU page, updated in place from the changed values.
+    Every cell keeps the glyph of each dataref drawn into it (one layer per dataref
+    in subscription order), the last layer with a character is shown. Lines with
+    changed cells are collected in dirty until the page is sent.
+    '''
 
-        if "MCDU1spa" in v: # and color == 'w':
-            pos = int(v.split('[')[1].split(']')[0])
-            if pos > 21: # prevent amber color on vert slew keys
+    def __init__(self):
+        self.page = [[' '] * PAGE_BYTES_PER_LINE for _ in range(PAGE_LINES)]
+        self.cells = {}
+        self.layers = [[[] for _ in range(PAGE_CHARS_PER_LINE)] for _ in range(PAGE_LINES)]
+        self.layer_index = {} # key = dataref, value = its layer in the cell
+        self.spw_line = [0] * PAGE_CHARS_PER_LINE
+        self.spa_line = [0] * PAGE_CHARS_PER_LINE
+        self.vertslew_key = None
+        self.dirty = set() # lines changed since the page was sent
+
+    def reset(self, cells):
+        '''
+        Clear the page and create the layers for the datarefs in cells (page_cells of a side).
+        '''
+        self.cells = cells
+        self.layers = [[[] for _ in range(PAGE_CHARS_PER_LINE)] for _ in range(PAGE_LINES)]
+        self.layer_index = {}
+        for dataref, (line, pos, color, font_small, kind) in cells.items():
+            if kind == CELL_TEXT or kind == CELL_SYMBOL:
+                layers = self.layers[line][pos]
+                self.layer_index[dataref] = len(layers)
+                layers.append(None)
+        for line in self.page:
+            line[:] = [' '] * PAGE_BYTES_PER_LINE
+        self.spw_line[:] = [0] * PAGE_CHARS_PER_LINE
+        self.spa_line[:] = [0] * PAGE_CHARS_PER_LINE
+        self.vertslew_key = None
+        self._update_scratchpad()
+        self.dirty = set(range(PAGE_LINES))
+
+    def update(self, values):
+        '''
+        Apply the changed values (dict dataref -> value), returns True if a line changed.
+        '''
+        scratchpad = False
+        cells = self.cells
+        layer_index = self.layer_index
+        page_layers = self.layers
+        for v, value in values.items():
+            cell = cells.get(v)
+            if cell is None:
                 continue
-            spa_line[pos] = val
-            continue
- 
-        if not spw_spa_data:
-            if color == 's':
-                color = None
-            if "MCDU1s" not in v and color != None:
-                color = chr(ord(color) - 32) # convert y in Y, a in A, ... if not small font
-            if color == None:
-                color = 'm' # symbol
-        if "VertSlewKeys" in v:
-            vertslew_key = val # 1: up/down, 2: up, 3: down
-
+            line, pos, color, font_small, kind = cell
+            val = int(value)
+            if kind == CELL_SPW:
+                self.spw_line[pos] = val
+                scratchpad = True
+            elif kind == CELL_SPA:
+                self.spa_line[pos] = val
+                scratchpad = True
+            elif kind == CELL_VERTSLEW:
+                key = None if val == 0x0 or val == 0x20 else val # 1: up/down, 2: up, 3: down
+                if key != self.vertslew_key:
+                    self.vertslew_key = key
+                    self.dirty.add(PAGE_LINES - 1) # arrows are drawn into the last line
+            else:
+                index = layer_index.get(v)
+                if index is None:
+                    continue
+                if val == 0x0 or val == 0x20:
+                    glyph = None
+                else:
+                    if kind == CELL_SYMBOL:
+                        val, color = color.get(val, (val, 'm')) # 'm' for the other symbols
+                    glyph = (color, font_small, chr(val))
+                layers = page_layers[line][pos]
+                if layers[index] == glyph:
+                    continue
+                layers[index] = glyph
+                for top in reversed(layers):
+                    if top is not None:
+                        break
+                else:
+                    top = BLANK_CELL
+                self._set_cell(line, pos, top)
+        if scratchpad:
+            self._update_scratchpad()
+        return bool(self.dirty)
+
+    def _set_cell(self, line, pos, glyph):
+        row = self.page[line]
         pos = pos * PAGE_BYTES_PER_CHAR # we decode color and font (2 bytes) and char(1 byte) = sum 3 bytes per char
+        color, font_small, char = glyph
+        if row[pos] != color or row[pos + 1] != font_small or row[pos + PAGE_BYTES_PER_CHAR - 1] != char:
+            row[pos] = color
+            row[pos + 1] = font_small
+            row[pos + PAGE_BYTES_PER_CHAR - 1] = char
+            self.dirty.add(line)
+
+    def _update_scratchpad(self):
+        spw_line = list(self.spw_line)
+        spa_line = list(self.spa_line)
+        #workaround for buggy spa / spw data
+        for i in range(PAGE_CHARS_PER_LINE):
+            if spw_line[i] == 0:
+                spw_line[i:] = [0] * len(spw_line[i:]) # remove all data after first 0
+                break
+        for i in range(PAGE_CHARS_PER_LINE):
+            if spa_line[i] == 0:
+                spa_line[i:] = [0] * len(spa_line[i:]) # remove all data after first 0
+                break
+        # combine spw and spa data
+        for i in range(PAGE_CHARS_PER_LINE):
+            if spw_line[i] != 0 and spa_line[i] == 0:
+                self._set_cell(PAGE_LINES - 1, i, ('w', 0, chr(spw_line[i])))
+            elif spw_line[i] == 0 and spa_line[i] != 0:
+                self._set_cell(PAGE_LINES - 1, i, ('a', 0, chr(spa_line[i])))
+            else:
+                self._set_cell(PAGE_LINES - 1, i, ('w', 0, chr(0x20)))
 
-        if data_valid: # we received mcdu data
-                newline = page_tmp[line]
-                newline[pos] = str(color)
-                if PAGE_BYTES_PER_CHAR == 3:
-                    newline[pos + 1] = font_small
-                newline[pos + PAGE_BYTES_PER_CHAR - 1] = chr(val)
-                page_tmp[line] = newline
-    
-    #workaround for buggy spa / spw data
-    for i in range(PAGE_CHARS_PER_LINE):
-        if spw_line[i] == 0:
-            spw_line[i:] = [0] * len(spw_line[i:]) # remove all data after first 0
-            break
-    for i in range(PAGE_CHARS_PER_LINE):
-        if spa_line[i] == 0:
-            spa_line[i:] = [0] * len(spa_line[i:]) # remove all data after first 0
-            break
-    # combine spw and spa data
-    #print(f"spw after: {spw_line}, spa: {spa_line}")
-    for i in range(PAGE_CHARS_PER_LINE):
-        if spw_line[i] != 0 and spa_line[i] == 0:
-            page_tmp[13][i * PAGE_BYTES_PER_CHAR ] = str('w')
-            page_tmp[13][i * PAGE_BYTES_PER_CHAR + 1] = 0
-            page_tmp[13][i * PAGE_BYTES_PER_CHAR + PAGE_BYTES_PER_CHAR - 1] = chr(spw_line[i])
-        elif spw_line[i] == 0 and spa_line[i] != 0:
-            page_tmp[13][i * PAGE_BYTES_PER_CHAR ] = str('a')
-            page_tmp[13][i * PAGE_BYTES_PER_CHAR + 1] = 0
-            page_tmp[13][i * PAGE_BYTES_PER_CHAR + PAGE_BYTES_PER_CHAR - 1] = chr(spa_line[i])
-        else:
-            page_tmp[13][i * PAGE_BYTES_PER_CHAR ] = str('w')
-            page_tmp[13][i * PAGE_BYTES_PER_CHAR + 1] = 0
-            page_tmp[13][i * PAGE_BYTES_PER_CHAR + PAGE_BYTES_PER_CHAR - 1] = chr(0x20)
-
-    if page != page_tmp:
-        new = True
-
-    #display MCDU in Console
-    if page != page_tmp:
-        page = page_tmp.copy()
-        up = ' '
-        down = ' '
-        if vertslew_key == 1:
-            up = '🠉'
-            down = '🠋'
-        elif vertslew_key == 2:
-            up = '🠉'
-        elif vertslew_key == 3:
-            down = '🠋'
-
-        print("|------ MCDU SCREEN -----|")
-        for i in range(PAGE_LINES):
-            print('|', end='')
-            for j in range(PAGE_CHARS_PER_LINE):
-                val = page[i][j * PAGE_BYTES_PER_CHAR + PAGE_BYTES_PER_CHAR - 1]
-                if val == '#':
-                    #val = '▯'
-                    val = '☐'
-                if val == '`':
-                    val = '°'
-                if val == '>':
-                    val = '🠊'
-                if val == '<':
-                    val = '🠈'
-                print(val, end='')
-            print('|')
-        print("|------------------------|")
-        print("")
-
-
-    #display mcdu on winwing
-    if new == True or usb_retry == True:
-
-        if True:
-            #try: # dataref may not be received already, even when connected
-            #    exped_led_state_desired = datacache['AirbusFBW/APVerticalMode'] >= 112
-            #except:
-            #    exped_led_state_desired = False
-            display_mgr.set_from_page(page_tmp, vertslew_key)
-        sleep(0.05)
+
+page_models = {} # key = side (1, 2), value = McduPage shown by the units of the side
+
+def set_datacache(units, values):
+    #write leds ob buttons (also NONE Buttons)
+    for unit in units:
+        datacache = unit.datacache
+        for v in led_datarefs:
+            if v not in values or v not in datacache:
+                continue
+            value = values[v]
+            if "DUBrightness" in v and value <= 1:
+                # brightness is in 0..1, we need 0..255
+                value = int(value * 255)
+            if "/anim" in v and value > 255:
+                # brightness is in 0..270, we need 0..255
+                value = 255
+            if datacache[v] != int(value):
+                print(f'cache: v:{v} val:{int(value)}')
+                datacache[v] = int(value)
+                set_button_led_lcd(unit.usb_mgr.device, unit.buttonlist, v, int(value))
+
+    for side, model in page_models.items():
+        new = model.update(values)
+        page = model.page
+        vertslew_key = model.vertslew_key
+
+        #display MCDU in Console, the first MCDU only
+        if new and console_mirror and side == min(page_models):
+            console_mirror.request(page, vertslew_key)
+
+        #display mcdu on winwing
+        if new == True or usb_retry == True:
+            for unit in units:
+                if unit.side == side:
+                    unit.renderer.request(page, vertslew_key)
+            model.dirty.clear()
 
 
 def colorname_from_char(c):
@@ -845,24 +1169,30 @@ class UsbManager:
     def __init__(self):
         self.device = None
         self.device_config = 0
+        self.path = None # hid.enumerate() path
 
-    def connect_device(self, vid: int, pid: int):
+    def connect_device(self, path: bytes):
 
         # Connect to device. Linux uses device whreas mac uses Device
+        # opened by path, two MCDUs of the same type have the same vid/pid
         try:
             self.device = hid.device()
-            self.device.open(vid, pid)
+            self.device.open_path(path)
         except AttributeError as e:
             print("[MCDU] using hidapi mac version")
-            self.device = hid.Device(vid=vid, pid=pid)
+            self.device = hid.Device(path=path)
+        self.path = path
 
         if self.device is None:
             raise RuntimeError("[MCDU] Device not found")
 
         print("[MCDU] Device connected.")
 
-    def find_device(self):
-        device_config = 0
+    def find_devices(self):
+        '''
+        Return (path, device_config, name) of every connected MCDU, several
+        of the same type as well. Only the first interface of a device is used.
+        '''
         devlist = [
             {'vid': 0x4098, 'pid': 0xbb36, 'name': 'MCDU - Captain', 'mask': DEVICEMASK.MCDU | DEVICEMASK.CAP},
             {'vid': 0x4098, 'pid': 0xbb3e, 'name': 'MCDU - First Offizer', 'mask': DEVICEMASK.MCDU | DEVICEMASK.FO},
@@ -873,59 +1203,89 @@ class UsbManager:
             {'vid': 0x4098, 'pid': 0xbc1d, 'name': 'PFP 4 (not tested)', 'mask': DEVICEMASK.PFP4},
             #{'vid': 0x4098, 'pid': 0xbd1d, 'name': 'PFP 7 (not tested)', 'mask': DEVICEMASK.PFP7}
         ]
+        found = []
         for d in devlist:
             print(f"[MCDU] now searching for winwing {d['name']} ... ", end='')
-            found = False
-            for dev in hid.enumerate():
-                if dev['vendor_id'] == d['vid'] and dev['product_id'] == d['pid']:
-                    print("found")
-                    self.device_config |= d['mask']
-                    # to force F/O or CAP, uncomment the following line
-                    #self.device_config = DEVICEMASK.MCDU | DEVICEMASK.CAP
-                    #self.device_config = DEVICEMASK.MCDU | DEVICEMASK.FO
-                    return d['vid'], d['pid'], self.device_config
-            print("not found")
-        return None, None, 0
+            matches = [dev for dev in hid.enumerate() if dev['vendor_id'] == d['vid'] and dev['product_id'] == d['pid']]
+            if not matches:
+                print("not found")
+                continue
+            print("found")
+            device_config = d['mask']
+            # to force F/O or CAP, uncomment the following line
+            #device_config = DEVICEMASK.MCDU | DEVICEMASK.CAP
+            #device_config = DEVICEMASK.MCDU | DEVICEMASK.FO
+            interface = min(dev.get('interface_number', -1) for dev in matches)
+            for dev in matches:
+                if dev.get('interface_number', -1) == interface: # one entry per device
+                    found.append((dev['path'], device_config, d['name']))
+        return found
+
+
+class McduUnit:
+
+    '''
+    One MCDU hardware unit with its own display, render thread, buttons and leds.
+    side is the aircraft MCDU it shows: 1 for captain and observer, 2 for F/O.
+    '''
+
+    def __init__(self, name, usb_mgr):
+        self.name = name
+        self.usb_mgr = usb_mgr
+        self.side = 2 if usb_mgr.device_config & DEVICEMASK.FO else 1
+        self.display_mgr = DisplayManager(usb_mgr.device)
+        self.renderer = RenderScheduler(self.display_mgr)
+        self.buttonlist = create_button_list_mcdu(usb_mgr.device_config)
+        self.buttons_press_event = [0] * BUTTONS_CNT
+        self.buttons_release_event = [0] * BUTTONS_CNT
+        self.buttons_last = 0
+        self.datacache = {}
 
 
 class device:
     def __init__(self, UDP_IP, UDP_PORT):
-        self.usb_mgr = None
+        self.units = [] # McduUnit per connected MCDU
         self.cyclic = Event()
 
-        self.xp = XPlaneUdp.XPlaneUdp()
-        self.xp.BeaconData["IP"] = UDP_IP # workaround to set IP and port
-        self.xp.BeaconData["Port"] = UDP_PORT
-        self.xp.UDP_PORT = self.xp.BeaconData["Port"]
+        self.xp = XPlaneUdp.shared_hub(UDP_IP, UDP_PORT).Subscriber("MCDU")
+        self.text_source = None
+        if MCDU_DATA_SOURCE == "websocket":
+            self.text_source = McduWebsocketSource()
 
 
     def connected(self):
-        if not device_config:
+        if not self.units:
             return
         global xplane_connected
+        global page_dirty
         print(f"[MCDU] X-Plane connected")
-        self.display_mgr.write_line_to_page(8, 1, 'registering datarefs', 'G')
-        self.display_mgr.set_from_page()
-        RequestDataRefs(self.xp, device_config)
-        winwing_mcdu_set_leds(self.usb_mgr.device, Leds.FAIL, 0)
+        for unit in self.units:
+            unit.display_mgr.write_line_to_page(8, 1, 'registering datarefs', 'G')
+            unit.display_mgr.set_from_page()
+        RequestDataRefs(self.xp, self.units, self.text_source)
+        for unit in self.units:
+            winwing_mcdu_set_leds(unit.usb_mgr.device, Leds.FAIL, 0)
         xplane_connected = True
-        page[0][0] = 'X' # force redraw
+        page_dirty = True # rebuild the pages for the new subscriptions
 
 
     def disconnected(self):
         global xplane_connected
 
-        if not device_config:
+        if not self.units:
             return
         xplane_connected = False
         print(f"[MCDU] X-Plane disconnected")
-        winwing_mcdu_set_leds(self.usb_mgr.device, Leds.FAIL, 1)
-        self.display_mgr.startupscreen(self.version, self.new_version)
+        for unit in self.units:
+            winwing_mcdu_set_leds(unit.usb_mgr.device, Leds.FAIL, 1)
+            unit.renderer.cancel()
+            unit.display_mgr.startupscreen(self.version, self.new_version)
+            summary = unit.renderer.summary()
+            print(f"[MCDU] {unit.name}: {summary['frames']} frames rendered for {summary['updates']} updates")
 
 
     def cyclic_worker(self):
         global value
-        global device_config
         global values
 
         self.cyclic.wait()
@@ -940,28 +1300,37 @@ class device:
 
     def init_device(self, version: str = None, new_version: str = None):
         global values, xplane_connected
-        global device_config
+        global console_mirror
 
         self.version = version
         self.new_version = new_version
 
-        self.usb_mgr = UsbManager()
-        vid, pid, device_config = self.usb_mgr.find_device()
+        for path, device_config, name in UsbManager().find_devices():
+            usb_mgr = UsbManager()
+            usb_mgr.connect_device(path)
+            usb_mgr.device_config = device_config
+            unit = McduUnit(name, usb_mgr)
+            unit.display_mgr.startupscreen(self.version, self.new_version)
+            self.units.append(unit)
 
-        if pid is None:
+        if not self.units:
             print(f" [MCDU] No compatible winwing device found, quit")
             return
-        else:
-            self.usb_mgr.connect_device(vid=vid, pid=pid)
-
-        self.display_mgr = DisplayManager(self.usb_mgr.device)
-        self.display_mgr.startupscreen(self.version, self.new_version)
 
-        create_button_list_mcdu()
+        mirror = MCDU_CONSOLE_MIRROR
+        if mirror is None:
+            mirror = sys.stdout.isatty() # no screens in the log of a service
+        if mirror and console_mirror is None:
+            console_mirror = ConsoleMirror()
+        for unit in self.units:
+            handler = lambda data_in, unit=unit: mcdu_read_report(self.xp, unit, data_in)
+            if hid_reactor.register(unit.usb_mgr.path, handler, unit.name):
+                continue
+            usb_event_thread = Thread(target=mcdu_create_events, args=[self.xp, unit])
+            usb_event_thread.start()
 
-        usb_event_thread = Thread(target=mcdu_create_events, args=[self.xp, self.usb_mgr, self.display_mgr])
-        usb_event_thread.start()
+        page_thread = Thread(target=mcdu_update_pages, args=[self.xp, self.units, self.text_source])
+        page_thread.start()
 
         cyclic_thread = Thread(target=self.cyclic_worker)
         cyclic_thread.start()
-
@@ -9,6 +9,7 @@ import time
 import struct
 import uinput
 
+import hid_reactor
 import xp_websocket
 
 BUTTONS_CNT = 42 # TODO
@@ -122,6 +123,7 @@ ledlist = []
 values = []
 buttons_press_event = [0] * BUTTONS_CNT
 buttons_release_event = [0] * BUTTONS_CNT
+buttons_last = 0
 display_manager = None
 motor1_old_value = 0
 
@@ -229,10 +231,45 @@ def um32_button_event(usb_mgr):
                     xp.command_activate(b.dataref, 0)
 
 
+def throttle_read_report(usb_mgr, data_in):
+    global buttons_last
+    if not xplane_connected: # buttons are ignored until x-plane is connected
+        return
+    if len(data_in) == 64 or len(data_in) == 14: # we get this often but don't understand yet. May have someting to do with leds set
+        return
+    if len(data_in) != 37:
+        print(f'[UM32] rx data count {len(data_in)} not valid for {usb_mgr}')
+        return
+    #print(f"data_in: {data_in}")
+
+    #create button bit-pattern
+    buttons = 0
+    for i in range(6):
+        buttons |= data_in[i + 1] << (8 * i)
+    #print(hex(buttons)) # TEST2: you should see a difference when pressing buttons
+    for i in range (BUTTONS_CNT):
+        mask = 0x01 << i
+        if xor_bitmask(buttons, buttons_last, mask):
+            #print(f"buttons: {format(buttons, "#04x"):^14}")
+            if buttons & mask:
+                buttons_press_event[i] = 1
+            else:
+                buttons_release_event[i] = 1
+            um32_button_event(usb_mgr)
+    buttons_last = buttons
+
+    th_left = struct.unpack('<H', bytes(data_in[13:15]))[0]
+    th_right = struct.unpack('<H', bytes(data_in[15:17]))[0]
+    spoiler = struct.unpack('<H', bytes(data_in[19:21]))[0]
+
+    usb_mgr.joystick_proxy.emit(uinput.ABS_X, th_left, syn=False) # Throttle left
+    usb_mgr.joystick_proxy.emit(uinput.ABS_Y, th_right, syn=False) # Throttle right
+    usb_mgr.joystick_proxy.emit(uinput.ABS_Z, spoiler) # Spoiler
+
+
 def throttle_create_events(xp, usb_mgr, display_mgr):
     global values
     sleep(2) # wait for values to be available
-    buttons_last = 0
     #xplane_connected = True # TODO remove
     while True:
         if not xplane_connected: # wait for x-plane
@@ -249,36 +286,7 @@ def throttle_create_events(xp, usb_mgr, display_mgr):
             print(f'[UM32]  *** continue after usb-in error: {error} ***') # TODO
             sleep(0.5) # TODO remove
             continue
-        if len(data_in) == 64 or len(data_in) == 14: # we get this often but don't understand yet. May have someting to do with leds set
-            continue
-        if len(data_in) != 37:
-            print(f'[UM32] rx data count {len(data_in)} not valid for {usb_mgr}')
-            continue
-        #print(f"data_in: {data_in}")
-
-        #create button bit-pattern
-        buttons = 0
-        for i in range(6):
-            buttons |= data_in[i + 1] << (8 * i)
-        #print(hex(buttons)) # TEST2: you should see a difference when pressing buttons
-        for i in range (BUTTONS_CNT):
-            mask = 0x01 << i
-            if xor_bitmask(buttons, buttons_last, mask):
-                #print(f"buttons: {format(buttons, "#04x"):^14}")
-                if buttons & mask:
-                    buttons_press_event[i] = 1
-                else:
-                    buttons_release_event[i] = 1
-                um32_button_event(usb_mgr)
-        buttons_last = buttons
-
-        th_left = struct.unpack('<H', bytes(data_in[13:15]))[0]
-        th_right = struct.unpack('<H', bytes(data_in[15:17]))[0]
-        spoiler = struct.unpack('<H', bytes(data_in[19:21]))[0]
-
-        usb_mgr.joystick_proxy.emit(uinput.ABS_X, th_left, syn=False) # Throttle left
-        usb_mgr.joystick_proxy.emit(uinput.ABS_Y, th_right, syn=False) # Throttle right
-        usb_mgr.joystick_proxy.emit(uinput.ABS_Z, spoiler) # Spoiler
+        throttle_read_report(usb_mgr, data_in)
 
 
 def eval_data(value, eval_string):
@@ -306,25 +314,21 @@ def xplane_ws_listener(data, led_dataref_ids): # receive ids and find led
         else:
             print(f"[UM32] not defined {data}")
         return
-    for ref_id_str, value in data["data"].items():
-        ref_id = int(ref_id_str)
+    for ref_id, value in data["data"].items():
         #print(f"[A107] searching for {ref_id}...", end='')
         if ref_id in led_dataref_ids:
             ledobj = led_dataref_ids[ref_id]
 
-            if type(value) is list: # dataref array, ledlist array
+            if type(value) is dict or type(value) is list: # dataref array (dict of the used indices), ledlist array
                 if type(ledobj) != list:
                     print(f"[UM32] ERROR: led array dataref not registered as list!")
                     exit()
-                idx = 0
-                for v in value:
+                for idx, v in (value.items() if type(value) is dict else enumerate(value)):
                     for l2 in ledobj: # we received an array, send update to all objects
                         if idx == l2.dreftype.value - DREF_TYPE.ARRAY_0.value:
-                            value_new = eval_data(value[idx], l2.eval)
+                            value_new = eval_data(v, l2.eval)
                             display_manager.set_leds(l2.nr, value_new)
-
-                    idx += 1
-            elif type(ledobj) == list and type(value) != list: # multiple leds on same dataref (without dataref arry), for eval
+            elif type(ledobj) == list: # multiple leds on same dataref (without dataref arry), for eval
                 for l in ledobj:
                     value_new = eval_data(value, l.eval)
                     print(f" found: {l.label} = {value_new}")
@@ -405,6 +409,7 @@ class UsbManager:
     def __init__(self):
         self.device = None
         self.device_config = 0
+        self.path = None # hid.enumerate() path of the device, hidapi opens the first match of vid/pid
         self.joystick_proxy = None
 
     def connect_device(self, vid: int, pid: int):
@@ -464,6 +469,7 @@ class UsbManager:
                 if dev['vendor_id'] == d['vid'] and dev['product_id'] == d['pid']:
                     print("found")
                     self.device_config |= d['mask']
+                    self.path = dev['path']
                     return d['vid'], d['pid'], self.device_config
             print("not found")
         return None, None, 0
@@ -661,8 +667,7 @@ class device:
         print(f"[UM32] X-Plane connected")
         xplane_get_dataref_ids(self.xp)
         print(f"[UM32] subsrcibe datarefs... ", end="")
-        t = Thread(target=self.xp.datarefs_subscribe, args=(self.xp.led_dataref_ids, xplane_ws_listener))
-        t.start()
+        self.xp.datarefs_subscribe(self.xp.led_dataref_ids, xplane_ws_listener, xp_websocket.led_array_indices(self.xp.led_dataref_ids, DREF_TYPE.ARRAY_0))
         print(f"done")
         xplane_connected = True
         xp = self.xp
@@ -715,8 +720,10 @@ class device:
 
         create_button_list_um32()
 
-        usb_event_thread = Thread(target=throttle_create_events, args=[self.xp, self.usb_mgr, self.display_mgr])
-        usb_event_thread.start()
+        handler = lambda data_in: throttle_read_report(self.usb_mgr, data_in)
+        if not hid_reactor.register(self.usb_mgr.path, handler, "UM32"):
+            usb_event_thread = Thread(target=throttle_create_events, args=[self.xp, self.usb_mgr, self.display_mgr])
+            usb_event_thread.start()
 
         cyclic_thread = Thread(target=self.cyclic_worker)
         cyclic_thread.start()
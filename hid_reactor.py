@@ -0,0 +1,142 @@
+import errno
+import os
+import select
+from queue import SimpleQueue
+from threading import Lock, Thread
+
+HID_REACTOR = True # False: every device reads its reports in its own polling loop
+HIDRAW_DEV = "/dev/hidraw"
+REPORT_MAX_LEN = 1024 # bytes per read, one input report is returned per read
+
+
+def hidraw_node(path):
+    '''
+    Return the /dev/hidrawN node of a device path from hid.enumerate(), None if the
+    device is not opened through hidraw (hidapi with libusb backend, MacOS).
+    '''
+    if isinstance(path, bytes):
+        path = path.decode(errors="replace")
+    if path and path.startswith(HIDRAW_DEV) and os.path.exists(path):
+        return path
+    return None
+
+
+class HidReactor:
+
+    '''
+    One thread for the input reports of all devices. The hidraw nodes are
+    registered with epoll, every report is queued to the worker thread of its
+    device as soon as it arrives. Nothing is polled while no report comes in.
+    The reactor thread only reads, so a handler that blocks delays the reports
+    of its own device only.
+    '''
+
+    def __init__(self):
+        self.epoll = select.epoll()
+        self.lock = Lock()
+        self.handlers = {} # key = fd, value = (name, report queue of the worker)
+        self.thread = None
+
+    def add(self, path, handler, name):
+        fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        reports = SimpleQueue()
+        Thread(target=self._worker, args=[reports, handler, name], daemon=True).start()
+        with self.lock:
+            self.handlers[fd] = (name, reports)
+            self.epoll.register(fd, select.EPOLLIN)
+            if self.thread is None:
+                self.thread = Thread(target=self._run, daemon=True)
+                self.thread.start()
+        print(f"[HID] {name} reads {path} in the input reactor")
+
+    def remove(self, fd):
+        with self.lock:
+            entry = self.handlers.pop(fd, None)
+            try:
+                self.epoll.unregister(fd)
+            except (OSError, ValueError):
+                pass
+        os.close(fd)
+        if entry is not None:
+            entry[1].put(None) # stop the worker after the queued reports
+
+    def _worker(self, reports, handler, name):
+        while True:
+            data = reports.get()
+            if data is None:
+                return
+            try:
+                handler(data)
+            except Exception as error:
+                print(f"[HID] {name} continue after report error: {error}")
+
+    def _read(self, fd, name, reports):
+        while True: # all reports queued since the last wakeup
+            try:
+                data = os.read(fd, REPORT_MAX_LEN)
+            except BlockingIOError:
+                return True
+            except OSError as error:
+                if error.errno == errno.EINTR:
+                    continue
+                print(f"[HID] {name} removed from the input reactor: {error}")
+                return False
+            if not data:
+                return True
+            reports.put(data)
+
+    def _run(self):
+        while True:
+            try:
+                events = self.epoll.poll()
+            except InterruptedError:
+                continue
+            for fd, event in events:
+                entry = self.handlers.get(fd)
+                if entry is None:
+                    continue
+                name, reports = entry
+                ok = self._read(fd, name, reports)
+                if event & (select.EPOLLHUP | select.EPOLLERR):
+                    print(f"[HID] {name} disconnected")
+                    ok = False
+                if not ok:
+                    self.remove(fd)
+
+
+shared = None
+shared_lock = Lock()
+
+
+def shared_reactor():
+    '''
+    Return the process wide HidReactor, create it on first use.
+    '''
+    global shared
+    with shared_lock:
+        if shared is None:
+            shared = HidReactor()
+    return shared
+
+
+def register(path, handler, name):
+    '''
+    Pass every input report of the device at path (the hid.enumerate() path of the
+    opened device) to handler(data), in order, from a worker thread of the device.
+    No handler runs on the reactor thread, so nothing there waits for the network;
+    a handler that blocks (e.g. a REST lookup of a dataref id) still delays all
+    following reports of its device and should be avoided.
+    Return False if there is no epoll (not Linux) or the device has no hidraw node,
+    the caller reads the reports in its own loop then.
+    '''
+    if not HID_REACTOR or not hasattr(select, "epoll"):
+        return False
+    node = hidraw_node(path)
+    if node is None:
+        return False
+    try:
+        shared_reactor().add(node, handler, name)
+    except OSError as error:
+        print(f"[HID] {name} can not open {node}: {error}, polling")
+        return False
+    return True
@@ -0,0 +1,87 @@
+import unittest
+from threading import Lock
+
+try:
+    import hid # noqa: F401, needed by devices.winwing_fcu
+except ImportError as error:
+    raise unittest.SkipTest(f"hid not available: {error}")
+
+import XPlaneUdp
+import devices.winwing_fcu as fcu
+
+
+class FakeXp:
+    BeaconData = {}
+
+
+class FakeHub:
+    '''
+    XPlaneUdpHub without socket, subscriptions are ignored.
+    '''
+    def __init__(self):
+        self.xp = FakeXp()
+        self.lock = Lock()
+        self.freqs = {}
+
+    def Subscribe(self, subscriber, datarefs):
+        pass
+
+
+class FakeHidDevice:
+    def write(self, data):
+        return len(data)
+
+
+class FakeUsbManager:
+    def __init__(self):
+        self.device = FakeHidDevice()
+
+
+class FcuReconnectTest(unittest.TestCase):
+
+    def setUp(self):
+        self.lcd = []
+        self.set_lcd = fcu.winwing_fcu_set_lcd
+        fcu.winwing_fcu_set_lcd = lambda device, speed, heading, alt, vs: self.lcd.append((speed, heading, alt, vs))
+        fcu.device_config = fcu.DEVICEMASK.FCU
+        fcu.buttonlist.clear()
+        fcu.create_button_list_fcu()
+        self.xp = XPlaneUdp.XPlaneUdpSubscriber(FakeHub(), "FCU")
+        self.dev = fcu.device.__new__(fcu.device) # no hub, no usb device
+        self.dev.xp = self.xp
+        self.usb_mgr = FakeUsbManager()
+        self.values = {d: 0 for d, _ in fcu.datarefs}
+        self.values.update({
+            'sim/cockpit2/autopilot/airspeed_dial_kts_mach': 250,
+            'sim/cockpit/autopilot/heading_mag': 90,
+            'sim/cockpit/autopilot/altitude': 5000,
+            'sim/cockpit/autopilot/vertical_velocity': 1200,
+        })
+
+    def tearDown(self):
+        fcu.winwing_fcu_set_lcd = self.set_lcd
+        fcu.device_config = fcu.DEVICEMASK.NONE
+        fcu.buttonlist.clear()
+
+    def receive(self, values):
+        self.xp._Put(dict(values))
+        self.xp.GetValues()
+
+    def test_reconnect_refills_datacache(self):
+        self.dev.connected()
+        cursor = self.xp.ChangeCursor()
+        self.receive(self.values)
+        fcu.fcu_process_changes(self.xp, self.usb_mgr, cursor)
+        self.assertEqual(self.lcd[-1], (250, 90, 5000, '12##'))
+
+        self.dev.connected() # X-Plane reconnect, RequestDataRefs clears the datacache
+        self.assertIsNone(fcu.datacache['sim/cockpit/autopilot/altitude'])
+        self.receive({'sim/cockpit/autopilot/vertical_velocity': -700})
+        fcu.fcu_process_changes(self.xp, self.usb_mgr, cursor)
+        for dataref, _ in fcu.datarefs:
+            self.assertIsNotNone(fcu.datacache[dataref], dataref)
+        self.assertEqual(self.lcd[-1], (250, 90, 5000, '07##'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# Benchmark for building the MCDU page from the received values.
+# Compares the baseline code (new 14x72 page every cycle from all values, cell
+# positions parsed from the dataref names, compare with the last page) with the incremental McduPage of devices/winwing_mcdu.py that is
+# updated in place from the changed values only.
+# Reports CPU time and the memory allocated (tracemalloc peak) per MCDU update for
+#   keystroke: one character typed into the scratchpad
+#   page flip: all text datarefs change to a new page
+#   no change: a value changes between 0 and space, nothing to redraw
+#
+# Usage:
+#   python3 tools/bench_mcdu_page.py
+# License: GPLv3
+
+import os
+import random
+import sys
+import tracemalloc
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import devices.winwing_mcdu as mcdu
+
+UPDATES = 200
+
+
+class Subscriptions:
+  def AddDataRefs(self, datarefs):
+    self.datarefs = [d for d, freq in datarefs]
+
+
+class Unit:
+  # captain MCDU without hardware
+  side = 1
+  def __init__(self):
+    self.buttonlist = mcdu.create_button_list_mcdu(mcdu.DEVICEMASK.MCDU | mcdu.DEVICEMASK.CAP)
+    self.datacache = {}
+
+
+def legacy_update(values, last_page, datacache, config):
+  # set_datacache of the baseline (f106f36) as it was, without console and usb output:
+  # new 14x72 page from all values, cell position parsed from the dataref name
+  new = False
+
+  vertslew_key = None
+  page_tmp = [[' ' for i in range(0, mcdu.PAGE_BYTES_PER_LINE)] for j in range(0, mcdu.PAGE_LINES)]
+  spw_line = [0] * mcdu.PAGE_BYTES_PER_LINE
+  spa_line = [0] * mcdu.PAGE_BYTES_PER_LINE
+  for v in values:
+    pos = 0
+    val = int(values[v])
+    data_valid = False
+
+    if "DUBrightness" in v and values[v] <= 1:
+      # brightness is in 0..1, we need 0..255
+      values[v] = int(values[v] * 255)
+    if "/anim" in v and values[v] > 255:
+      # brightness is in 0..270, we need 0..255
+      values[v] = 255
+
+    #write leds ob buttons (also NONE Buttons)
+    if "DUBrightness" in v or "/anim" in v:
+      if datacache[v] != int(values[v]):
+        datacache[v] = int(values[v]) # print and led write left out
+
+
+    color = v.split('[')[0][-1]
+    font_small = 1 # 0 .. normal, 1 .. small
+    if ('cont' in v and not 'scont' in v) or 'spw' in v:
+      font_small = 0 # normal
+    if ('title' in v and not 'stitle' in v) or 'spa' in v:
+      font_small = 0 # normal
+
+    if config & mcdu.DEVICEMASK.FO:
+      v = v.replace('MCDU2', 'MCDU1')
+
+    #print(f"page: v:{v} val:{val},'{chr(val)}', col:{color}")
+    if val == 0x0 or (val == 0x20 and not 'MCDU1spw' in v and not 'MCDU1spa' in v):
+      continue
+    if color == 's':
+      if chr(val) == 'A':
+        val = 91 # '[', should be blue
+        color = 'b'
+      if chr(val) == 'B':
+        val = 93 # ']', should be blue
+        color = 'b'
+      if chr(val) == '0':
+        val = 60 # '<', should be a small blue arrow
+        color = 'b'
+      if chr(val) == '1':
+        val = 62 # '>', should be a small bluearrow
+        color = 'b'
+      if chr(val) == '2':
+        val = 60 # '<', should be a small white arrow in title
+        color = 'w'
+      if chr(val) == '3':
+        val = 62 # '>', should be a small white arrow in title
+        color = 'w'
+      if chr(val) == '4':
+        val = 60 # '<', should be a small orange arrow in cont
+        color = 'a'
+      if chr(val) == '5':
+        val = 62 # '>'
+        color = 'a'
+      if chr(val) == 'E':
+        val = 35 # '#', should be an orange box
+        color = 'a'
+      #print(f"page: v:{v} val:{val},'{chr(val)}', col:{color}")
+    if "MCDU1title" in v or "MCDU1stitle" in v:
+      pos = int(v.split('[')[1].split(']')[0])
+      line = 0
+      data_valid = True
+    if "MCDU1label" in v:
+      line = int(v.split('label')[1][0]) * 2 - 1
+      pos = int(v.split('[')[1].split(']')[0])
+      data_valid = True
+      if v.split('[')[0][-2] == 'L':
+        font_small = 0 # normal
+    if "MCDU1cont" in v or "MCDU1scont" in v: # and color == 'w':
+      line = int(v.split('cont')[1][0]) * 2
+      pos = int(v.split('[')[1].split(']')[0])
+      data_valid = True
+    spw_spa_data = False
+    if "MCDU1spw" in v: # and color == 'w':
+      pos = int(v.split('[')[1].split(']')[0])
+
+      spw_line[pos] = val
+      continue
+
+    if "MCDU1spa" in v: # and color == 'w':
+      pos = int(v.split('[')[1].split(']')[0])
+      if pos > 21: # prevent amber color on vert slew keys
+        continue
+      spa_line[pos] = val
+      continue
+
+    if not spw_spa_data:
+      if color == 's':
+        color = None
+      if "MCDU1s" not in v and color != None:
+        color = chr(ord(color) - 32) # convert y in Y, a in A, ... if not small font
+      if color == None:
+        color = 'm' # symbol
+    if "VertSlewKeys" in v:
+      vertslew_key = val # 1: up/down, 2: up, 3: down
+
+    pos = pos * mcdu.PAGE_BYTES_PER_CHAR # we decode color and font (2 bytes) and char(1 byte) = sum 3 bytes per char
+
+    if data_valid: # we received mcdu data
+        newline = page_tmp[line]
+        newline[pos] = str(color)
+        if mcdu.PAGE_BYTES_PER_CHAR == 3:
+          newline[pos + 1] = font_small
+        newline[pos + mcdu.PAGE_BYTES_PER_CHAR - 1] = chr(val)
+        page_tmp[line] = newline
+
+  #workaround for buggy spa / spw data
+  for i in range(mcdu.PAGE_CHARS_PER_LINE):
+    if spw_line[i] == 0:
+      spw_line[i:] = [0] * len(spw_line[i:]) # remove all data after first 0
+      break
+  for i in range(mcdu.PAGE_CHARS_PER_LINE):
+    if spa_line[i] == 0:
+      spa_line[i:] = [0] * len(spa_line[i:]) # remove all data after first 0
+      break
+  # combine spw and spa data
+  #print(f"spw after: {spw_line}, spa: {spa_line}")
+  for i in range(mcdu.PAGE_CHARS_PER_LINE):
+    if spw_line[i] != 0 and spa_line[i] == 0:
+      page_tmp[13][i * mcdu.PAGE_BYTES_PER_CHAR ] = str('w')
+      page_tmp[13][i * mcdu.PAGE_BYTES_PER_CHAR + 1] = 0
+      page_tmp[13][i * mcdu.PAGE_BYTES_PER_CHAR + mcdu.PAGE_BYTES_PER_CHAR - 1] = chr(spw_line[i])
+    elif spw_line[i] == 0 and spa_line[i] != 0:
+      page_tmp[13][i * mcdu.PAGE_BYTES_PER_CHAR ] = str('a')
+      page_tmp[13][i * mcdu.PAGE_BYTES_PER_CHAR + 1] = 0
+      page_tmp[13][i * mcdu.PAGE_BYTES_PER_CHAR + mcdu.PAGE_BYTES_PER_CHAR - 1] = chr(spa_line[i])
+    else:
+      page_tmp[13][i * mcdu.PAGE_BYTES_PER_CHAR ] = str('w')
+      page_tmp[13][i * mcdu.PAGE_BYTES_PER_CHAR + 1] = 0
+      page_tmp[13][i * mcdu.PAGE_BYTES_PER_CHAR + mcdu.PAGE_BYTES_PER_CHAR - 1] = chr(0x20)
+
+  if last_page != page_tmp:
+    new = True
+  return new, page_tmp
+
+
+def random_page(text_datarefs, lines):
+  # one color per line, the other colors of the line are empty
+  values = dict.fromkeys(text_datarefs, 0.0)
+  for line, refs in lines.items():
+    base = random.choice(sorted(refs))
+    for i, dataref in enumerate(refs[base]):
+      values[dataref] = float(random.choice(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789/ "))
+  return values
+
+
+def scenarios(values, text_datarefs, lines, spw):
+  # like XPlaneUdp.GetChanges, only values that differ from the last update
+  keystroke, flip, nochange = [], [], []
+  for n in range(UPDATES):
+    keystroke.append({spw[n % len(spw)]: float(ord('A') + n % 26)})
+    page = random_page(text_datarefs, lines)
+    flip.append({d: v for d, v in page.items() if values[d] != v})
+    values.update(page)
+    dataref = text_datarefs[n % len(text_datarefs)]
+    if values[dataref] in (0.0, 32.0):
+      nochange.append({dataref: 32.0 if n % 2 else 0.0})
+  return {"keystroke": keystroke, "page flip": flip, "no change": nochange or keystroke}
+
+
+def measure(name, updates, values, process, setup = None):
+  # CPU without tracemalloc, then the allocations in a second run
+  for traced in (False, True):
+    current_values = dict(values)
+    if setup:
+      setup()
+    if traced:
+      tracemalloc.start()
+    peak = 0
+    duration = 0.0
+    for changes in updates:
+      current_values.update(changes)
+      if traced:
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+      start = perf_counter()
+      process(current_values, changes)
+      duration += perf_counter() - start
+      if traced:
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+      else:
+        cpu = duration
+    tracemalloc.stop()
+  print(f"{name:>26}: {cpu * 1e6 / len(updates):8.1f} us, {peak / 1024:7.1f} KiB allocated per update")
+
+
+if __name__ == '__main__':
+  random.seed(1)
+  subscriptions = Subscriptions()
+  mcdu.RequestDataRefs(subscriptions, [Unit()])
+  cells = mcdu.page_cells[1]
+  text_datarefs = [d for d, cell in cells.items() if cell[4] in (mcdu.CELL_TEXT, mcdu.CELL_SYMBOL)]
+  lines = {} # key = line, value = dict dataref name -> datarefs of the line
+  for dataref in text_datarefs:
+    line = cells[dataref][0]
+    lines.setdefault(line, {}).setdefault(dataref.split('[')[0], []).append(dataref)
+  spw = [d for d, cell in cells.items() if cell[4] == mcdu.CELL_SPW]
+  values = {d: 0.0 for d in subscriptions.datarefs}
+  values.update(random_page(text_datarefs, lines))
+  print(f"{len(values)} subscribed values, {UPDATES} updates per scenario")
+
+  for name, updates in scenarios(dict(values), text_datarefs, lines, spw).items():
+    state = {"page": None}
+    datacache = dict.fromkeys(values)
+    def legacy(current, changes):
+      new, state["page"] = legacy_update(current.copy(), state["page"], datacache, mcdu.DEVICEMASK.MCDU | mcdu.DEVICEMASK.CAP)
+    measure(f"{name} legacy", updates, values, legacy)
+
+    page_model = mcdu.McduPage()
+    def incremental(current, changes):
+      if page_model.update(changes):
+        page_model.dirty.clear()
+    def setup():
+      page_model.reset(cells)
+      page_model.update(values)
+    measure(f"{name} incremental", updates, values, incremental, setup)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# Micro-benchmark for the RREF decoder in XPlaneUdp.
+# Compares the old per-value struct.unpack loop with XPlaneUdp.DecodeRref
+# on MCDU sized subscriptions (~3000 datarefs, 183 values per datagram).
+# License: GPLv3
+
+import os
+import socket
+import struct
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import XPlaneUdp
+
+DATAREFS = 3000
+VALUES_PER_PACKET = (1472 - 5) // 8
+ROUNDS = 20
+
+
+def decode_legacy(datarefs, data):
+  # decoder as used up to v1.4
+  retvalues = {}
+  values = data[5:]
+  lenvalue = 8
+  numvalues = int(len(values)/lenvalue)
+  for i in range(0,numvalues):
+    singledata = data[(5+lenvalue*i):(5+lenvalue*(i+1))]
+    (idx,value) = struct.unpack("<if", singledata)
+    if idx in datarefs.keys():
+      if value < 0.0 and value > -0.001 :
+        value = 0.0
+      retvalues[datarefs[idx]] = value
+  return retvalues
+
+
+def build_packets():
+  packets = []
+  for start in range(0, DATAREFS, VALUES_PER_PACKET):
+    packet = bytearray(XPlaneUdp.RREF_HEADER)
+    for idx in range(start, min(start + VALUES_PER_PACKET, DATAREFS)):
+      packet += struct.pack("<if", idx, float(32 + idx % 64))
+    packets.append(bytes(packet))
+  return packets
+
+
+def run(name, decode, packets):
+  values = 0
+  start = perf_counter()
+  for _ in range(ROUNDS):
+    for p in packets:
+      values += len(decode(p))
+  duration = perf_counter() - start
+  print(f"{name:>8}: {values / duration:12,.0f} values/s ({duration * 1000 / ROUNDS:.2f} ms per {DATAREFS} values)")
+  return values / duration
+
+
+if __name__ == '__main__':
+  # local stand-in socket for X-Plane, receives the RREF requests
+  sim = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+  sim.bind(("127.0.0.1", 0))
+  xp = XPlaneUdp.XPlaneUdp()
+  xp.BeaconData["IP"] = "127.0.0.1"
+  xp.BeaconData["Port"] = sim.getsockname()[1]
+  xp.UDP_PORT = xp.BeaconData["Port"]
+  xp.AddDataRefs([(f"AirbusFBW/MCDU1cont{i // 24}w[{i % 24}]", 2) for i in range(DATAREFS)])
+  packets = build_packets()
+  views = [memoryview(p) for p in packets]
+
+  assert decode_legacy(xp.datarefs, packets[0]) == xp.DecodeRref(views[0])
+  before = run("legacy", lambda p: decode_legacy(xp.datarefs, p), packets)
+  after = run("batch", xp.DecodeRref, views)
+  print(f"speedup: {after / before:.1f}x")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# Micro-benchmark for DREF/CMND sends of XPlaneUdp.
+# Measures building the message alone, and the time from a button event
+# (WriteDataRef / SendCommand call) until the datagram arrives on a local
+# stand-in socket for X-Plane, for the old per-call message building and the
+# prebuilt messages. The sendto syscall dominates the second number, so the
+# difference there is mostly within the run to run noise.
+#
+# Usage:
+#   python3 tools/bench_udp_send.py
+# License: GPLv3
+
+import os
+import socket
+import struct
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import XPlaneUdp
+
+ROUNDS = 20000
+DATAREF = "sim/cockpit2/autopilot/altitude_dial_ft"
+COMMAND = "sim/autopilot/altitude_up"
+
+
+class LegacyXPlaneUdp(XPlaneUdp.XPlaneUdp):
+  # message building as used up to v1.4
+
+  def _CommandMessage(self, command):
+    return struct.pack("<4sx500s", b'CMND', command.encode('utf-8'))
+
+  def _DataRefMessage(self, dataref, value, vtype='float'):
+    cmd = b"DREF\x00"
+    dataref  =dataref+'\x00'
+    string = dataref.ljust(500).encode()
+    message = "".encode()
+    if vtype == "float":
+      message = struct.pack("<5sf500s", cmd,value,string)
+    elif vtype == "int":
+      message = struct.pack("<5si500s", cmd, value, string)
+    elif vtype == "bool":
+      message = struct.pack("<5sI500s", cmd, int(value), string)
+    assert(len(message)==509)
+    return message
+
+  def SendCommand(self,command):
+    self.socket.sendto(self._CommandMessage(command), (self.BeaconData["IP"], self.UDP_PORT))
+
+  def WriteDataRef(self,dataref,value,vtype='float'):
+    self.socket.sendto(self._DataRefMessage(dataref, value, vtype), (self.BeaconData["IP"], self.UDP_PORT))
+
+
+def build(name, xp, message):
+  start = perf_counter()
+  for i in range(ROUNDS):
+    message(xp, i)
+  duration = perf_counter() - start
+  print(f"{name:>22}: build {duration / ROUNDS * 1e6:6.2f} us")
+
+
+def run(name, xp, sim, send):
+  buf = bytearray(1024)
+  call = 0.0
+  total = 0.0
+  for i in range(ROUNDS):
+    start = perf_counter()
+    send(xp, i)
+    sent = perf_counter()
+    sim.recv_into(buf)
+    total += perf_counter() - start
+    call += sent - start
+  print(f"{name:>22}: call {call / ROUNDS * 1e6:6.2f} us, button to sim {total / ROUNDS * 1e6:6.2f} us")
+
+
+if __name__ == '__main__':
+  sim = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+  sim.bind(("127.0.0.1", 0))
+  sim.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+
+  for name, cls in [("legacy", LegacyXPlaneUdp), ("prebuilt", XPlaneUdp.XPlaneUdp)]:
+    xp = cls()
+    build(f"{name} DREF", xp, lambda xp, i: xp._DataRefMessage(DATAREF, float(i)))
+    build(f"{name} CMND", xp, lambda xp, i: xp._CommandMessage(COMMAND))
+    xp.BeaconData["IP"] = "127.0.0.1"
+    xp.BeaconData["Port"] = sim.getsockname()[1]
+    xp.UDP_PORT = xp.BeaconData["Port"]
+    run(f"{name} WriteDataRef", xp, sim, lambda xp, i: xp.WriteDataRef(DATAREF, float(i)))
+    run(f"{name} SendCommand", xp, sim, lambda xp, i: xp.SendCommand(COMMAND))
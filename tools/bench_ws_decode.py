@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# Benchmark for decoding and routing websocket dataref_update_values frames.
+# Compares the old path (json.loads, int() per id, listeners walking whole arrays)
+# with the dispatch of XP_WebsocketSession (string id table, only the array
+# indices used by a led) with the json and the orjson backend.
+#
+# Usage:
+#   python3 tools/bench_ws_decode.py [frames.txt] [--used N]
+# frames.txt holds one received frame per line, record it with
+# xp_websocket.shared_session().record_frames("frames.txt") while flying.
+# Without a file, frames shaped like the ToLiSS overhead panel traffic are generated.
+# License: GPLv3
+
+import argparse
+import json
+import os
+import random
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import xp_websocket
+
+ROUNDS = 20
+SCALARS = 60
+ARRAYS = 4
+ARRAY_LEN = 200 # e.g. AirbusFBW/OHPLightsATA21_Raw
+FRAMES = 1000
+
+
+class Led:
+  def __init__(self, index):
+    self.index = index
+
+
+def generate_frames():
+  random.seed(1)
+  ids = list(range(1000, 1000 + SCALARS + ARRAYS))
+  arrays = {id: [0.0] * ARRAY_LEN for id in ids[SCALARS:]}
+  frames = []
+  for _ in range(FRAMES):
+    # X-Plane sends the changed datarefs, an array as a whole
+    data = {}
+    for id in random.sample(ids, 8):
+      if id in arrays:
+        arrays[id][random.randrange(ARRAY_LEN)] = float(random.randrange(2))
+        data[str(id)] = list(arrays[id])
+      else:
+        data[str(id)] = float(random.randrange(2))
+    frames.append(json.dumps({"type": "dataref_update_values", "data": data}))
+  return frames
+
+
+def led_map(frames, used):
+  # one led per scalar, `used` leds on the first elements of every array
+  leds = {}
+  for frame in frames:
+    for ref_id_str, value in json.loads(frame).get("data", {}).items():
+      if isinstance(value, list):
+        leds[int(ref_id_str)] = [Led(i) for i in range(min(used, len(value)))]
+      else:
+        leds[int(ref_id_str)] = Led(None)
+  return leds
+
+
+def listener_legacy(data, leds):
+  # listener as used up to v1.4
+  hits = 0
+  for ref_id_str, value in data["data"].items():
+    ref_id = int(ref_id_str)
+    if ref_id in leds:
+      ledobj = leds[ref_id]
+      if type(value) is list:
+        for idx, v in enumerate(value):
+          for led in ledobj:
+            if idx == led.index:
+              hits += 1
+      else:
+        hits += 1
+  return hits
+
+
+def listener(data, leds):
+  hits = 0
+  for ref_id, value in data["data"].items():
+    if ref_id in leds:
+      ledobj = leds[ref_id]
+      if type(value) is dict or type(value) is list:
+        for idx, v in (value.items() if type(value) is dict else enumerate(value)):
+          for led in ledobj:
+            if idx == led.index:
+              hits += 1
+      else:
+        hits += 1
+  return hits
+
+
+def run(name, frames, process):
+  start = perf_counter()
+  for _ in range(ROUNDS):
+    for frame in frames:
+      process(frame)
+  duration = perf_counter() - start
+  rate = len(frames) * ROUNDS / duration
+  print(f"{name:>16}: {rate:10,.0f} frames/s ({duration * 1e6 / ROUNDS / len(frames):.1f} us per frame)")
+  return rate
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument("frames", nargs="?", help="recorded frames, one per line")
+  parser.add_argument("--used", type=int, default=1, help="leds per array dataref (default 1)")
+  args = parser.parse_args()
+
+  if args.frames:
+    with open(args.frames) as f:
+      frames = [line for line in f.read().splitlines() if line]
+  else:
+    frames = generate_frames()
+  leds = led_map(frames, args.used)
+  print(f"{len(frames)} frames, {sum(len(f) for f in frames) / len(frames):.0f} bytes per frame, {len(leds)} datarefs")
+
+  before = run("legacy", frames, lambda frame: listener_legacy(json.loads(frame), leds))
+
+  session = xp_websocket.XP_WebsocketSession()
+  indices = {id: [led.index for led in ledobj] for id, ledobj in leds.items() if isinstance(ledobj, list)}
+  session._register("bench", leds, listener, indices)
+  dispatch = session._dispatch
+  after = run("session json", frames, lambda frame: dispatch(json.loads(frame)))
+  loads = xp_websocket.json_loads
+  if loads is not json.loads:
+    after = run("session orjson", frames, lambda frame: dispatch(loads(frame)))
+  print(f"speedup: {after / before:.1f}x")
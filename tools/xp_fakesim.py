@@ -0,0 +1,668 @@
+#!/usr/bin/env python3
+# Stand-in for X-Plane to run XSchenFly without a simulator, e.g. for load and latency tests.
+# Speaks both protocols used by XSchenFly:
+#  - UDP (XPlaneUdp): RREF subscriptions, CMND and DREF on port 49000
+#  - web API (xp_websocket): /api/v2 REST and websocket on port 8086
+# Datarefs and commands are created on first use, values are driven by generators.
+# License: GPLv3
+#
+# Usage:
+#   python3 tools/xp_fakesim.py --mcdu-flip 2 --altitude-spin 500 --stats 5
+#   python3 tools/xp_fakesim.py --script myscenario.py
+#
+# A script defines setup(sim) and registers generators with sim.every(hz, function),
+# a generator is called as function(sim, t) with t seconds since start:
+#
+#   def setup(sim):
+#     sim.every(10, lambda sim, t: sim.set("sim/cockpit/autopilot/heading_mag", (t * 10) % 360))
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+from time import monotonic
+from urllib.parse import urlsplit, parse_qs
+
+XPLANE_VERSION = "12.1.0"
+
+RREF_REQUEST = struct.Struct("<5sii400s")
+RREF_VALUE = struct.Struct("<if")
+RREF_VALUES_PER_DATAGRAM = (1472 - 5) // RREF_VALUE.size
+DREF_MESSAGE = struct.Struct("<5sf500s")
+
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WS_TEXT = 0x1
+WS_BINARY = 0x2
+WS_CLOSE = 0x8
+WS_PING = 0x9
+WS_PONG = 0xA
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+# MCDU text datarefs: AirbusFBW/MCDU<side><line><color>, 24 characters each
+MCDU_LINES = ["title", "stitle"] + [f"{kind}{i}" for kind in ("label", "cont", "scont") for i in range(1, 7)] + ["sp"]
+MCDU_COLORS = "abgmswy"
+MCDU_CHARS = 24
+MCDU_PAGES = [
+  {
+    "titlew": "INIT",
+    "label1w": " CO RTE",
+    "cont1a": "[         ]",
+    "label2w": "ALTN/CO RTE",
+    "cont2a": "----/----------",
+    "label3w": "FLT NBR",
+    "cont3a": "[[[[[[[[",
+    "label6w": "COST INDEX",
+    "cont6a": "---",
+    "cont6b": "                  WIND>",
+  },
+  {
+    "titlew": " LFPG-EDDM",
+    "label1w": " FROM       UTC  SPD/ALT",
+    "cont1g": "LFPG      1420   ---/ 392",
+    "cont2g": "DIKOL     1428  250/ FL100",
+    "cont3g": "OKRIX     1436   ---/FL340",
+    "cont4m": "(T/D)     1512   ---/FL340",
+    "cont5g": "EDDM      1535   ---/ 1490",
+    "scont6w": "DEST   TIME  DIST  EFOB",
+    "cont6w": "EDDM   1535  379   6.2",
+  },
+]
+
+# commands with a visible effect on datarefs
+COMMAND_STEPS = {
+  "sim/autopilot/altitude_up": ("sim/cockpit/autopilot/altitude", 100),
+  "sim/autopilot/altitude_down": ("sim/cockpit/autopilot/altitude", -100),
+  "sim/autopilot/heading_up": ("sim/cockpit/autopilot/heading_mag", 1),
+  "sim/autopilot/heading_down": ("sim/cockpit/autopilot/heading_mag", -1),
+  "sim/autopilot/airspeed_up": ("sim/cockpit/autopilot/airspeed", 1),
+  "sim/autopilot/airspeed_down": ("sim/cockpit/autopilot/airspeed", -1),
+  "sim/autopilot/vertical_speed_up": ("sim/cockpit/autopilot/vertical_velocity", 100),
+  "sim/autopilot/vertical_speed_down": ("sim/cockpit/autopilot/vertical_velocity", -100),
+}
+
+
+def split_index(name):
+  # "AirbusFBW/MCDU1titlew[3]" -> ("AirbusFBW/MCDU1titlew", 3)
+  if name.endswith("]") and "[" in name:
+    base, index = name[:-1].split("[", 1)
+    return base, int(index)
+  return name, None
+
+
+def value_type(value):
+  if isinstance(value, bytearray):
+    return "data"
+  if isinstance(value, list):
+    return "int_array" if value and isinstance(value[0], int) else "float_array"
+  return "int" if isinstance(value, int) else "float"
+
+
+def json_value(value):
+  # byte array datarefs are base64 encoded by the web API
+  if isinstance(value, bytearray):
+    return base64.b64encode(value).decode()
+  if isinstance(value, list):
+    return list(value)
+  return value
+
+
+class Sim:
+
+  '''
+  Dataref and command state shared by the UDP and web API servers.
+  '''
+
+  def __init__(self, verbose = False):
+    self.values = {} # key = dataref, value = float, int, list or bytearray
+    self.ids = {} # key = dataref, value = id
+    self.names = {} # key = id, value = dataref
+    self.command_ids = {} # key = command, value = id
+    self.command_names = {} # key = id, value = command
+    self.command_count = {} # key = command, value = number of activations
+    self.command_active = {} # key = command, value = release time or None while held
+    self.command_hooks = {} # key = command, value = list of function(sim, command)
+    self.generators = [] # (hz, function)
+    self.next_id = 1000
+    self.start = monotonic()
+    self.verbose = verbose
+    self.stats = dict.fromkeys(("udp_rx", "udp_tx", "udp_values", "http", "ws_rx", "ws_tx", "commands", "writes"), 0)
+
+  def _new_id(self):
+    self.next_id += 1
+    return self.next_id
+
+  def dataref(self, name, value = 0.0):
+    '''
+    Create a dataref with an initial value, keep an existing one. Returns the id.
+    '''
+    id = self.ids.get(name)
+    if id is None:
+      id = self._new_id()
+      self.ids[name] = id
+      self.names[id] = name
+      self.values[name] = value
+    return id
+
+  def command(self, name):
+    id = self.command_ids.get(name)
+    if id is None:
+      id = self._new_id()
+      self.command_ids[name] = id
+      self.command_names[id] = name
+      self.command_count[name] = 0
+    return id
+
+  def get(self, name, index = None):
+    if index is None:
+      name, index = split_index(name)
+    value = self.values.get(name)
+    if value is None:
+      self.dataref(name)
+      return 0.0
+    if index is not None:
+      if not isinstance(value, (list, bytearray)):
+        return value if index == 0 else 0.0
+      return value[index] if index < len(value) else 0
+    return value
+
+  def set(self, name, value, index = None):
+    if index is None:
+      name, index = split_index(name)
+    self.dataref(name)
+    if index is None:
+      self.values[name] = value
+      return
+    array = self.values[name]
+    if not isinstance(array, (list, bytearray)):
+      array = self.values[name] = [array] if isinstance(array, int) else [float(array)]
+    if index >= len(array):
+      array.extend([0] * (index + 1 - len(array)))
+    array[index] = int(value) if isinstance(array, bytearray) else value
+
+  def set_text(self, name, text, length = MCDU_CHARS):
+    # byte array dataref holding a string, 0 padded
+    self.set(name, bytearray(text.encode()[:length].ljust(length, b"\0")))
+
+  def every(self, hz, function):
+    self.generators.append((hz, function))
+
+  def on_command(self, name, function):
+    self.command_hooks.setdefault(name, []).append(function)
+
+  def command_begin(self, name, duration = None):
+    self.command(name)
+    self.command_count[name] += 1
+    self.stats["commands"] += 1
+    self.command_active[name] = None if duration is None else monotonic() + duration
+    if self.verbose:
+      print(f"command {name}")
+    step = COMMAND_STEPS.get(name)
+    if step:
+      self.set(step[0], self.get(step[0]) + step[1])
+    for function in self.command_hooks.get(name, ()):
+      function(self, name)
+
+  def command_end(self, name):
+    self.command_active.pop(name, None)
+
+  def command_once(self, name):
+    self.command_begin(name)
+    self.command_end(name)
+
+  def write(self, name, value, index = None):
+    self.stats["writes"] += 1
+    if self.verbose:
+      print(f"write {name}{'' if index is None else f'[{index}]'} = {value}")
+    self.set(name, value, index)
+
+  async def run_generators(self):
+    async def run(hz, function):
+      interval = 1.0 / hz
+      next = monotonic()
+      while True:
+        function(self, monotonic() - self.start)
+        next += interval
+        await asyncio.sleep(max(0.0, next - monotonic()))
+    await asyncio.gather(*(run(hz, function) for hz, function in self.generators))
+
+  async def release_commands(self):
+    # end commands activated with a duration
+    while True:
+      now = monotonic()
+      for name, until in list(self.command_active.items()):
+        if until is not None and until <= now:
+          self.command_end(name)
+      await asyncio.sleep(0.01)
+
+
+def mcdu_page_flip(side = 1):
+  '''
+  Generator switching the MCDU between two pages on every call.
+  '''
+  prefix = f"AirbusFBW/MCDU{side}"
+  state = {"page": 0}
+  def flip(sim, t):
+    page = MCDU_PAGES[state["page"]]
+    state["page"] = (state["page"] + 1) % len(MCDU_PAGES)
+    for line in MCDU_LINES:
+      for color in MCDU_COLORS:
+        sim.set_text(prefix + line + color, page.get(line + color, ""))
+  return flip
+
+
+def altitude_spin(rate):
+  '''
+  Generator running the FCU altitude, heading and speed in circles, rate in ft/s.
+  '''
+  def spin(sim, t):
+    sim.set("sim/cockpit/autopilot/altitude", float(int(t * rate) % 40000 // 100 * 100))
+    sim.set("sim/cockpit/autopilot/heading_mag", float(int(t * rate / 100) % 360))
+    sim.set("sim/cockpit/autopilot/airspeed", float(100 + int(t * rate / 100) % 250))
+  return spin
+
+
+class UdpServer(asyncio.DatagramProtocol):
+
+  '''
+  RREF subscriptions, CMND and DREF as X-Plane handles them on port 49000.
+  '''
+
+  def __init__(self, sim, tick = 0.01):
+    self.sim = sim
+    self.tick = tick
+    self.transport = None
+    self.clients = {} # key = address, value = dict idx -> [dataref, interval, due]
+    self.buffer = bytearray(5 + RREF_VALUES_PER_DATAGRAM * RREF_VALUE.size)
+    self.buffer[0:5] = b"RREF,"
+
+  def connection_made(self, transport):
+    self.transport = transport
+
+  def datagram_received(self, data, addr):
+    sim = self.sim
+    sim.stats["udp_rx"] += 1
+    header = data[:4]
+    if header == b"RREF" and len(data) >= RREF_REQUEST.size:
+      cmd, freq, idx, name = RREF_REQUEST.unpack_from(data)
+      name = name.split(b"\0", 1)[0].decode()
+      subscriptions = self.clients.setdefault(addr, {})
+      if freq == 0:
+        subscriptions.pop(idx, None)
+      else:
+        sim.get(name) # create on first use
+        subscriptions[idx] = [name, 1.0 / freq, monotonic()]
+    elif header == b"CMND":
+      sim.command_once(data[5:].split(b"\0", 1)[0].decode())
+    elif header == b"DREF" and len(data) >= DREF_MESSAGE.size:
+      cmd, value, name = DREF_MESSAGE.unpack_from(data)
+      sim.write(name.split(b"\0", 1)[0].decode(), value)
+
+  async def run(self):
+    sim = self.sim
+    buffer = self.buffer
+    pack_into = RREF_VALUE.pack_into
+    while True:
+      now = monotonic()
+      for addr, subscriptions in list(self.clients.items()):
+        count = 0
+        for idx, subscription in subscriptions.items():
+          name, interval, due = subscription
+          if due > now:
+            continue
+          # keep the rate, but do not send a burst after a stall
+          subscription[2] = due + interval if due + interval > now else now + interval
+          value = sim.get(name)
+          pack_into(buffer, 5 + count * RREF_VALUE.size, idx, float(value) if not isinstance(value, (list, bytearray)) else 0.0)
+          count += 1
+          if count == RREF_VALUES_PER_DATAGRAM:
+            self._send(addr, count)
+            count = 0
+        if count:
+          self._send(addr, count)
+      await asyncio.sleep(self.tick)
+
+  def _send(self, addr, count):
+    self.transport.sendto(bytes(self.buffer[:5 + count * RREF_VALUE.size]), addr)
+    self.sim.stats["udp_tx"] += 1
+    self.sim.stats["udp_values"] += count
+
+
+class WebApi:
+
+  '''
+  /api/v2 REST endpoints and websocket on one HTTP/1.1 port, keep-alive supported.
+  '''
+
+  def __init__(self, sim, ws_rate = 20):
+    self.sim = sim
+    self.ws_interval = 1.0 / ws_rate
+
+  async def handle(self, reader, writer):
+    try:
+      while True:
+        request = await reader.readline()
+        if not request:
+          break
+        method, target, version = request.decode().split()
+        headers = {}
+        while True:
+          line = await reader.readline()
+          if line in (b"\r\n", b"\n", b""):
+            break
+          key, value = line.decode().split(":", 1)
+          headers[key.strip().lower()] = value.strip()
+        body = b""
+        if "content-length" in headers:
+          body = await reader.readexactly(int(headers["content-length"]))
+        self.sim.stats["http"] += 1
+        if headers.get("upgrade", "").lower() == "websocket":
+          await self.websocket(reader, writer, headers)
+          break
+        status, response = self.rest(method, target, body)
+        payload = json.dumps(response).encode()
+        writer.write(f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n".encode() + payload)
+        await writer.drain()
+        if headers.get("connection", "").lower() == "close":
+          break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+      pass
+    writer.close()
+
+  def rest(self, method, target, body):
+    sim = self.sim
+    url = urlsplit(target)
+    query = parse_qs(url.query)
+    path = url.path.rstrip("/").split("/")
+    if path[:3] == ["", "api", "capabilities"]:
+      return 200, {"api": {"versions": ["v1", "v2"]}, "x-plane": {"version": XPLANE_VERSION}}
+    if path[:3] != ["", "api", "v2"] or len(path) < 4:
+      return 404, {"error_code": "not_found", "error_message": f"{url.path} not found"}
+    path = path[3:]
+
+    if len(path) == 2 and path[1] == "count" and path[0] in ("datarefs", "commands") and method == "GET":
+      return 200, {"data": len(sim.ids if path[0] == "datarefs" else sim.command_ids)}
+
+    if path == ["datarefs"] and method == "GET":
+      names = query.get("filter[name]")
+      if names:
+        for name in names:
+          sim.dataref(name) # create on first use
+      else:
+        names = list(sim.ids)
+      return 200, {"data": [{"id": sim.ids[name], "name": name, "value_type": value_type(sim.values[name]), "is_writable": True} for name in names]}
+
+    if path == ["commands"] and method == "GET":
+      names = query.get("filter[name]")
+      if names:
+        for name in names:
+          sim.command(name)
+      else:
+        names = list(sim.command_ids)
+      return 200, {"data": [{"id": sim.command_ids[name], "name": name, "description": name} for name in names]}
+
+    if len(path) == 3 and path[0] == "datarefs" and path[2] == "value":
+      name = sim.names.get(int(path[1])) if path[1].isdigit() else None
+      if name is None:
+        return 404, {"error_code": "dataref_not_found", "error_message": f"dataref {path[1]} not found"}
+      index = int(query["index"][0]) if "index" in query else None
+      if method == "GET":
+        return 200, {"data": json_value(sim.get(name, index) if index is not None else sim.values[name])}
+      if method == "PATCH":
+        try:
+          value = json.loads(body)["data"]
+        except (ValueError, KeyError):
+          return 400, {"error_code": "invalid_body", "error_message": "expected {\"data\": value}"}
+        if isinstance(value, str):
+          value = bytearray(base64.b64decode(value))
+        sim.write(name, value, index)
+        return 200, {}
+      return 405, {"error_code": "method_not_allowed", "error_message": method}
+
+    if len(path) == 3 and path[0] == "command" and path[2] == "activate" and method == "POST":
+      name = sim.command_names.get(int(path[1])) if path[1].isdigit() else None
+      if name is None:
+        return 404, {"error_code": "command_not_found", "error_message": f"command {path[1]} not found"}
+      try:
+        duration = float(json.loads(body or b"{}").get("duration", 0))
+      except (ValueError, AttributeError):
+        return 400, {"error_code": "invalid_body", "error_message": "expected {\"duration\": seconds}"}
+      sim.command_begin(name, duration)
+      return 200, {}
+
+    return 404, {"error_code": "not_found", "error_message": f"{url.path} not found"}
+
+  async def websocket(self, reader, writer, headers):
+    accept = base64.b64encode(hashlib.sha1(headers["sec-websocket-key"].encode() + WS_GUID).digest()).decode()
+    writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                  f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+    await writer.drain()
+    session = WebsocketSession(self.sim, writer)
+    pusher = asyncio.ensure_future(session.push(self.ws_interval))
+    try:
+      while True:
+        opcode, payload = await ws_read(reader)
+        if opcode == WS_CLOSE:
+          ws_write(writer, WS_CLOSE, payload[:2])
+          break
+        if opcode == WS_PING:
+          ws_write(writer, WS_PONG, payload)
+        elif opcode in (WS_TEXT, WS_BINARY):
+          self.sim.stats["ws_rx"] += 1
+          session.message(payload)
+        await writer.drain()
+    finally:
+      pusher.cancel()
+
+
+async def ws_read(reader):
+  '''
+  Read one (possibly fragmented) client frame, returns (opcode, unmasked payload).
+  '''
+  message = b""
+  message_opcode = None
+  while True:
+    b0, b1 = await reader.readexactly(2)
+    opcode = b0 & 0x0F
+    length = b1 & 0x7F
+    if length == 126:
+      length = int.from_bytes(await reader.readexactly(2), "big")
+    elif length == 127:
+      length = int.from_bytes(await reader.readexactly(8), "big")
+    mask = await reader.readexactly(4) if b1 & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask and length:
+      key = (mask * (length // 4 + 1))[:length]
+      payload = (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(length, "big")
+    if opcode >= WS_CLOSE: # control frames may come between fragments
+      return opcode, payload
+    if opcode:
+      message_opcode = opcode
+    message += payload
+    if b0 & 0x80:
+      return message_opcode, message
+
+
+def ws_write(writer, opcode, payload):
+  length = len(payload)
+  if length < 126:
+    header = struct.pack("!BB", 0x80 | opcode, length)
+  elif length < 65536:
+    header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+  else:
+    header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+  writer.write(header + payload)
+
+
+class WebsocketSession:
+
+  '''
+  One websocket client: subscriptions and the values sent last.
+  '''
+
+  def __init__(self, sim, writer):
+    self.sim = sim
+    self.writer = writer
+    self.subscriptions = {} # key = id, value = index (None, int or list)
+    self.sent = {} # key = id, value = snapshot of the value sent last
+
+  def send(self, message):
+    self.sim.stats["ws_tx"] += 1
+    ws_write(self.writer, WS_TEXT, json.dumps(message).encode())
+
+  def result(self, req_id, error = None):
+    message = {"req_id": req_id, "type": "result", "success": error is None}
+    if error:
+      message["error_code"], message["error_message"] = error
+    self.send(message)
+
+  def message(self, payload):
+    sim = self.sim
+    try:
+      message = json.loads(payload)
+      req_id = message.get("req_id")
+      mtype = message["type"]
+      params = message.get("params", {})
+    except (ValueError, KeyError, AttributeError):
+      self.result(None, ("invalid_message", "could not parse message"))
+      return
+
+    if mtype == "dataref_subscribe_values":
+      for dataref in params.get("datarefs", []):
+        if dataref.get("id") not in sim.names:
+          self.result(req_id, ("invalid_dataref_id", f"dataref id {dataref.get('id')} not found"))
+          return
+      for dataref in params.get("datarefs", []):
+        self.subscriptions[dataref["id"]] = dataref.get("index")
+        self.sent.pop(dataref["id"], None) # send the current value with the next update
+      self.result(req_id)
+
+    elif mtype == "dataref_unsubscribe_values":
+      datarefs = params.get("datarefs", [])
+      if datarefs == "all":
+        self.subscriptions.clear()
+      else:
+        for dataref in datarefs:
+          self.subscriptions.pop(dataref.get("id"), None)
+      self.result(req_id)
+
+    elif mtype == "dataref_set_values":
+      for dataref in params.get("datarefs", []):
+        name = sim.names.get(dataref.get("id"))
+        if name is None:
+          self.result(req_id, ("invalid_dataref_id", f"dataref id {dataref.get('id')} not found"))
+          return
+        value = dataref.get("value")
+        if isinstance(value, str):
+          value = bytearray(base64.b64decode(value))
+        index = dataref.get("index")
+        if isinstance(index, list):
+          for i, v in zip(index, value):
+            sim.write(name, v, i)
+        else:
+          sim.write(name, value, index)
+      self.result(req_id)
+
+    elif mtype == "command_set_is_active":
+      for command in params.get("commands", []):
+        name = sim.command_names.get(command.get("id"))
+        if name is None:
+          self.result(req_id, ("invalid_command_id", f"command id {command.get('id')} not found"))
+          return
+        if command.get("is_active"):
+          sim.command_begin(name, command.get("duration"))
+        else:
+          sim.command_end(name)
+      self.result(req_id)
+
+    else:
+      self.result(req_id, ("invalid_type", f"message type {mtype} not supported"))
+
+  def value(self, id, index):
+    value = self.sim.values[self.sim.names[id]]
+    if index is None:
+      return json_value(value), (bytes(value) if isinstance(value, bytearray) else tuple(value) if isinstance(value, list) else value)
+    if isinstance(index, list):
+      value = [self.sim.get(self.sim.names[id], i) for i in index]
+      return value, tuple(value)
+    value = self.sim.get(self.sim.names[id], index)
+    return value, value
+
+  async def push(self, interval):
+    # dataref_update_values with the changed values only, like X-Plane
+    while True:
+      data = {}
+      for id, index in self.subscriptions.items():
+        value, snapshot = self.value(id, index)
+        if self.sent.get(id, self) != snapshot:
+          self.sent[id] = snapshot
+          data[str(id)] = value
+      if data:
+        self.send({"type": "dataref_update_values", "data": data})
+        await self.writer.drain()
+      await asyncio.sleep(interval)
+
+
+async def print_stats(sim, interval):
+  last = dict(sim.stats)
+  while True:
+    await asyncio.sleep(interval)
+    stats = dict(sim.stats)
+    rates = ", ".join(f"{key} {(stats[key] - last[key]) / interval:.0f}/s" for key in stats)
+    print(f"{len(sim.ids)} datarefs, {len(sim.command_ids)} commands: {rates}")
+    last = stats
+
+
+async def serve(sim, args):
+  loop = asyncio.get_running_loop()
+  udp = UdpServer(sim, args.udp_tick)
+  await loop.create_datagram_endpoint(lambda: udp, local_addr=(args.host, args.udp_port))
+  web = WebApi(sim, args.ws_rate)
+  server = await asyncio.start_server(web.handle, args.host, args.http_port)
+  print(f"fake X-Plane {XPLANE_VERSION}: UDP {args.host}:{args.udp_port}, web API http://{args.host}:{args.http_port}/api/v2")
+  tasks = [udp.run(), sim.run_generators(), sim.release_commands()]
+  if args.stats:
+    tasks.append(print_stats(sim, args.stats))
+  async with server:
+    await asyncio.gather(*tasks)
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Fake X-Plane for running XSchenFly without the simulator.")
+  parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default 127.0.0.1)")
+  parser.add_argument("--udp-port", type=int, default=49000)
+  parser.add_argument("--http-port", type=int, default=8086)
+  parser.add_argument("--udp-tick", type=float, default=0.01, help="RREF send interval in s (default 0.01)")
+  parser.add_argument("--ws-rate", type=float, default=20, help="websocket updates per second (default 20)")
+  parser.add_argument("--mcdu-flip", type=float, metavar="HZ", help="flip the MCDU page HZ times per second")
+  parser.add_argument("--mcdu", type=int, default=1, choices=(1, 2), help="MCDU side for --mcdu-flip")
+  parser.add_argument("--altitude-spin", type=float, metavar="FT_PER_S", help="spin the FCU altitude, heading and speed")
+  parser.add_argument("--script", help="python file with setup(sim) registering generators")
+  parser.add_argument("--stats", type=float, metavar="SEC", help="print message rates every SEC seconds")
+  parser.add_argument("--verbose", action="store_true", help="print commands and dataref writes")
+  args = parser.parse_args()
+
+  sim = Sim(args.verbose)
+  sim.set("sim/aircraft/view/acf_tailnum", bytearray(b"D-FAKE".ljust(40, b"\0")))
+  sim.set_text("sim/aircraft/view/acf_relative_path", "Aircraft/Fake/A319.acf", 256)
+  if args.mcdu_flip:
+    sim.every(args.mcdu_flip, mcdu_page_flip(args.mcdu))
+  if args.altitude_spin:
+    sim.every(10, altitude_spin(args.altitude_spin))
+  if args.script:
+    namespace = {"__file__": args.script, "__name__": "xp_fakesim_script"}
+    with open(args.script) as f:
+      exec(compile(f.read(), args.script, "exec"), namespace)
+    namespace["setup"](sim)
+
+  try:
+    asyncio.run(serve(sim, args))
+  except KeyboardInterrupt:
+    pass
+
+
+if __name__ == '__main__':
+  main()
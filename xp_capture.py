@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# Capture and replay of X-Plane UDP traffic, to benchmark and debug without a running simulator.
+# License: GPLv3
+#
+# Log format (little endian):
+#   file header:  8 bytes magic "XSFCAP1\0"
+#   per datagram: double monotonic timestamp, uint8 direction (0 = received, 1 = sent),
+#                 1 byte padding, uint16 length, followed by the raw datagram bytes
+#
+# Usage:
+#   python3 xp_capture.py info capture.bin
+#   python3 xp_capture.py replay capture.bin [--speed 2.0 | --fast] [--port 49000]
+
+import argparse
+import mmap
+import socket
+import struct
+from threading import Lock
+from time import monotonic, sleep
+
+MAGIC = b"XSFCAP1\x00"
+RECORD = struct.Struct("<dBxH")
+RX = 0 # datagram received from X-Plane
+TX = 1 # datagram sent to X-Plane
+
+
+class CaptureWriter:
+
+    '''
+    Append datagrams to a capture log. Thread safe, rx and tx come from different threads.
+    Every record is flushed, XSchenFly ends with os._exit and would lose the buffered tail.
+    Writes after close are ignored.
+    '''
+
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.lock = Lock()
+        self.records = 0
+
+    def write(self, direction, data):
+        header = RECORD.pack(monotonic(), direction, len(data))
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(header)
+            self.file.write(data)
+            self.file.flush()
+            self.records += 1
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+class CaptureReader:
+
+    '''
+    Memory mapped capture log. Iterating yields (timestamp, direction, memoryview of the datagram),
+    the memoryview is only valid until the next record is read, copy it with bytes() to keep it.
+    '''
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a capture log")
+        self.view = memoryview(self.map)
+        self.data = None # view of the current record, released on close
+
+    def __iter__(self):
+        view = self.view
+        pos = len(MAGIC)
+        end = len(view)
+        while pos + RECORD.size <= end:
+            timestamp, direction, length = RECORD.unpack_from(view, pos)
+            pos += RECORD.size
+            if pos + length > end: # truncated last record
+                break
+            data = self.data = view[pos:pos + length]
+            yield timestamp, direction, data
+            data.release()
+            pos += length
+
+    def close(self):
+        # a loop left early still holds the view of its last record
+        if self.data is not None:
+            self.data.release()
+            self.data = None
+        self.view.release()
+        self.map.close()
+        self.file.close()
+
+
+def info(path):
+    reader = CaptureReader(path)
+    counts = [0, 0]
+    sizes = [0, 0]
+    first = last = None
+    for timestamp, direction, data in reader:
+        counts[direction] += 1
+        sizes[direction] += len(data)
+        if first is None:
+            first = timestamp
+        last = timestamp
+    duration = (last - first) if first is not None else 0.0
+    print(f"{path}: {duration:.3f} s")
+    print(f"  received: {counts[RX]} datagrams, {sizes[RX]} bytes")
+    print(f"  sent:     {counts[TX]} datagrams, {sizes[TX]} bytes")
+    reader.close()
+
+
+def replay(path, port = 49000, speed = 1.0, target = None):
+
+    '''
+    Serve the received datagrams of a capture log on localhost like X-Plane would.
+    Waits for the first request of a client (e.g. the RREF subscriptions) unless a target
+    address is given, then sends with original timing divided by speed.
+    speed 0 sends as fast as possible.
+    '''
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", port))
+    if target is None:
+        print(f"waiting for a client on port {port}")
+        request, target = sock.recvfrom(1472)
+    print(f"replaying {path} to {target[0]}:{target[1]}")
+
+    reader = CaptureReader(path)
+    sent = 0
+    nbytes = 0
+    first = None
+    start = monotonic()
+    for timestamp, direction, data in reader:
+        if direction != RX:
+            continue
+        if first is None:
+            first = timestamp
+        if speed > 0:
+            delay = start + (timestamp - first) / speed - monotonic()
+            if delay > 0:
+                sleep(delay)
+        sock.sendto(data, target)
+        sent += 1
+        nbytes += len(data)
+    duration = monotonic() - start
+    print(f"sent {sent} datagrams, {nbytes} bytes in {duration:.3f} s ({sent / max(duration, 1e-9):.0f} datagrams/s)")
+    reader.close()
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay X-Plane UDP capture logs.")
+    subparsers = parser.add_subparsers(dest="cmd", required=True)
+    p = subparsers.add_parser("info", help="show a summary of a capture log")
+    p.add_argument("file")
+    p = subparsers.add_parser("replay", help="serve received datagrams over localhost UDP")
+    p.add_argument("file")
+    p.add_argument("--port", type=int, default=49000, help="UDP port to serve on (default 49000)")
+    p.add_argument("--speed", type=float, default=1.0, help="replay speed factor (default 1.0)")
+    p.add_argument("--fast", action="store_true", help="send as fast as possible")
+    p.add_argument("--target", help="send to host:port instead of waiting for a client")
+    args = parser.parse_args()
+
+    if args.cmd == "info":
+        info(args.file)
+    else:
+        target = None
+        if args.target:
+            host, target_port = args.target.rsplit(":", 1)
+            target = (host, int(target_port))
+        replay(args.file, args.port, 0 if args.fast else args.speed, target)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,33 @@
 import asyncio
+import base64
 import json
+import os
+import sys
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import deque
+from threading import Lock, Thread, Timer
+from time import monotonic, perf_counter
 from requests import Session
+from requests.adapters import HTTPAdapter
 import websockets
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
 DEFAULT_XPLANE_WS_URL = "ws://localhost:8086/api/v2"
 DEFAULT_XPLANE_REST_URL = "http://localhost:8086/api/v2"
+SUBSCRIBE_DELAY = 0.2 # s, subscriptions of all devices within this time go into one request
+ID_CACHE_FILE = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "xschenfly", "xplane_ids.json")
+ID_FETCH_BATCH = 20 # names per filter request for names missing in the catalogue
+ID_FETCH_THREADS = 4
+AIRCRAFT_DATAREF = "sim/aircraft/view/acf_relative_path"
+RECONNECT_DELAY = 0.5 # s, first retry after the connection is lost, doubled up to RECONNECT_DELAY_MAX
+RECONNECT_DELAY_MAX = 10.0
+WEBSOCKET_WRITES = True # dataref writes and timed commands over the websocket, REST only while it is not connected
+REQUEST_TIMEOUT = 10.0 # s, a request without result is given up after this time
+LATENCY_WINDOW = 1000 # round trips per message type the percentiles are calculated from
 
 class XP_Websocket:
     def __init__(self, rest_url = DEFAULT_XPLANE_REST_URL, ws_url = DEFAULT_XPLANE_WS_URL):
@@ -17,26 +40,31 @@ class XP_Websocket:
         self.xp.headers["Accept"] = "application/json"
         self.xp.headers["Content-Type"] = "application/json"
         self.iddict = {}
-        self.req_id = 0
-        self.ws = None
         self.datacache = {}
-        self._lock = asyncio.Lock()
+        self.session = shared_session(ws_url)
+        self.resolver = shared_resolver(rest_url)
+        if self.resolver.invalidate not in self.session.on_disconnect:
+            self.session.on_disconnect.append(self.resolver.invalidate)
+            self.session.ids_valid = self.resolver.ids_valid
 
 
     def dataref_id_fetch(self, dataref):
-        xpdr_code_response = self.xp.get(self.rest_url + "/datarefs", params={"filter[name]": dataref})
-        if xpdr_code_response.status_code != 200:
-            print(f"could not get id for dataref {dataref}, Errorcode: {xpdr_code_response.status_code}:{xpdr_code_response.text}")
-            return None
-        return xpdr_code_response.json()["data"][0]["id"]
-    
+        return self.resolver.dataref_id(dataref)
+
 
     def command_id_fetch(self, command):
-        xpdr_code_response = self.xp.get(self.rest_url + "/commands", params={"filter[name]": command})
-        if xpdr_code_response.status_code != 200:
-            print(f"could not get id for command {command}, Errorcode: {xpdr_code_response.status_code}:{xpdr_code_response.text}")
-            return None
-        return xpdr_code_response.json()["data"][0]["id"]
+        return self.resolver.command_id(command)
+
+
+    def dataref_ids_fetch(self, datarefs):
+        '''
+        Resolve a list of datarefs at once, returns dict dataref -> id (None if unknown).
+        '''
+        return self.resolver.dataref_ids(datarefs)
+
+
+    def command_ids_fetch(self, commands):
+        return self.resolver.command_ids(commands)
 
 
     def dataref_set_value(self, id, value, index = None, isfloat = False):
@@ -46,6 +74,12 @@ class XP_Websocket:
         if isfloat == False:
             value = int(value)
 
+        if WEBSOCKET_WRITES and self.session.connected():
+            dataref = {"id": id, "value": value}
+            if index != None:
+                dataref["index"] = index
+            return self.session.submit("dataref_set_values", {"datarefs": [dataref]}, self)
+
         set_msg = {
             "data": value
         }
@@ -63,6 +97,9 @@ class XP_Websocket:
         if type(id) is not int:
             id = self.command_id_fetch(id)
 
+        if WEBSOCKET_WRITES and self.session.connected():
+            return self.session.submit("command_set_is_active", {"commands": [{"id": id, "is_active": True, "duration": duration}]}, self)
+
         set_msg = {
             "duration": duration
         }
@@ -74,68 +111,637 @@ class XP_Websocket:
             return None
 
     def command_activate(self, id, on : bool):
-        asyncio.run(self.async_command_activate(id, on))
-
-    async def async_command_activate(self, id, on : bool):
-        await (self.async_command_activate2(id, on))
-
-    async def async_command_activate2(self, id, on : bool):
         if type(id) is not int:
             id = self.command_id_fetch(id)
 
-        command_msg = {
-            "req_id": self.req_id,
-            "type": "command_set_is_active",
-            "params": {
-                "commands": [{"id": id,
-                                "is_active": bool(on)}
-                                ]
-            }
-        }
-        async with self._lock:
-            await self.ws.send(json.dumps(command_msg))
-            #print(f"activate command ws: {json.dumps(command_msg)} sent")
-            self.req_id += 1
+        return self.session.submit("command_set_is_active", {"commands": [{"id": id, "is_active": bool(on)}]}, self)
 
 
-    def datarefs_subscribe(self,dataref_list, update_callback = None):
-        asyncio.run(self.async_dataref_subscribe(dataref_list, update_callback))
+    def datarefs_subscribe(self, dataref_list, update_callback = None, indices = None):
+        '''
+        Subscribe the ids in dataref_list on the shared session, returns immediately.
+        update_callback(data, dataref_list) gets the dataref_update_values messages
+        reduced to the ids in dataref_list (data["data"] is keyed by int id) and the
+        failed results of this client.
+        indices: optional dict id -> array indices in use. For these ids an array value
+        is passed as dict index -> value with only the used indices.
+        '''
+        self.session.subscribe(self, dataref_list, update_callback, indices)
 
 
-    async def async_dataref_subscribe(self, dataref_list, update_callback):
-        await (self.async_dataref_subsrcibe2_listener(dataref_list, update_callback))
+    def latency_summary(self):
+        return self.session.latency_summary()
 
 
-    async def async_dataref_subsrcibe2_listener(self, dataref_list, update_callback):
-        async with websockets.connect(self.ws_url, open_timeout=100) as ws:
-            self.ws = ws
-            # Abonnement senden
-            subscribe_msg = {
-                "req_id": self.req_id,
-                "type": "dataref_subscribe_values",
-                "params": {
-                    "datarefs": [{"id": ref_id} for ref_id in dataref_list]
-                }
-            }
+class LatencyStats:
 
-            async with self._lock:
-                await ws.send(json.dumps(subscribe_msg))
-                self.req_id += 1
+    '''
+    Count, mean and maximum of a latency, thread safe.
+    '''
 
-            # wait for ack
-            ack = await ws.recv()
-            ack_data = json.loads(ack)
-            if not ack_data.get("success", False):
-                print(f"Abonnement fehlgeschlagen: {ack_data}")
-                return
+    def __init__(self):
+        self.lock = Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
 
-            # main-rx-Loop: get updates
-            while True:
+    def add(self, seconds):
+        with self.lock:
+            self.count += 1
+            self.total += seconds
+            self.last = seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def summary(self):
+        with self.lock:
+            mean = self.total / self.count if self.count else 0.0
+            return {"count": self.count, "mean_ms": mean * 1000, "max_ms": self.max * 1000, "last_ms": self.last * 1000}
+
+
+class LatencyWindow:
+
+    '''
+    Percentiles of a latency over the last `size` samples, thread safe.
+    '''
+
+    def __init__(self, size = LATENCY_WINDOW):
+        self.lock = Lock()
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+            self.count += 1
+
+    def summary(self):
+        with self.lock:
+            samples = sorted(self.samples)
+            count = self.count
+        if not samples:
+            return {"count": count, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        def percentile(p):
+            return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000
+        return {"count": count, "p50_ms": percentile(0.5), "p99_ms": percentile(0.99), "max_ms": samples[-1] * 1000}
+
+
+class XP_WebsocketSession:
+
+    '''
+    One websocket connection to X-Plane shared by all XP_Websocket clients of the process.
+    The subscriptions of all clients are merged into one dataref_subscribe_values request,
+    updates are routed by dataref id to the callbacks of the clients that subscribed the id.
+    The connection runs on a long-lived event loop in its own thread, requests from
+    other threads are queued to it with submit() and sent in order by one writer task.
+    '''
+
+    def __init__(self, ws_url = DEFAULT_XPLANE_WS_URL):
+        self.ws_url = ws_url
+        self.ws = None
+        self.req_id = 0
+        self.lock = Lock()
+        self.listeners = {} # key = client, value = (update_callback, dataref_list)
+        self.routes = {} # key = dataref id, value = list of clients
+        self.indices = {} # key = client, value = dict id -> tuple of used array indices
+        self.dispatch_table = {} # key = id as received (str), value = (id, tuple of (client, indices or None))
+        self.frame_log = None # file to record the received frames to, see record_frames()
+        self.subscribed = set() # ids subscribed on the current connection
+        self.requests = {} # key = req_id, value = (type, time sent, clients, futures, timeout handle) until the result arrives
+        self.task = None
+        self.flush_handle = None
+        self.on_disconnect = [] # functions called when the connection to X-Plane is lost
+        self.outbox = None # asyncio queue of (submitted, type, params, clients, future) of the current connection
+        # latency per call: "submit" is the time spent in the calling thread,
+        # per message type the time from submit until the message is written to the socket
+        self.latency = {"submit": LatencyStats()}
+        self.roundtrip = {} # key = message type, value = LatencyWindow from sending until the result arrives
+        self.reconnect = LatencyStats() # time from losing the connection until the subscriptions are restored
+        self.ids_valid = None # function telling if the ids are still valid after a reconnect
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+
+    def subscribe(self, client, dataref_list, update_callback, indices = None):
+        self._register(client, dataref_list, update_callback, indices)
+        self.loop.call_soon_threadsafe(self._schedule_subscribe)
+
+
+    def _register(self, client, dataref_list, update_callback, indices = None):
+        with self.lock:
+            self.listeners[client] = (update_callback, dataref_list)
+            self.indices[client] = {id: tuple(sorted(used)) for id, used in (indices or {}).items()}
+            for id, clients in list(self.routes.items()):
+                if client in clients and id not in dataref_list:
+                    self.routes[id] = [c for c in clients if c is not client]
+            for id in dataref_list:
+                clients = self.routes.setdefault(id, [])
+                if client not in clients:
+                    clients.append(client)
+            # the receive thread looks up the string ids of the frames, build the table once here
+            self.dispatch_table = {sys.intern(str(id)): (id, tuple((c, self.indices[c].get(id)) for c in clients))
+                                   for id, clients in self.routes.items() if clients}
+
+
+    def record_frames(self, path):
+        '''
+        Write every received frame to path, one per line, e.g. for tools/bench_ws_decode.py.
+        '''
+        self.frame_log = open(path, "w")
+
+
+    def submit(self, type, params, client = None):
+        '''
+        Queue a request from any thread without waiting for the event loop.
+        Returns a concurrent.futures.Future with the result message of X-Plane, None if not
+        connected. The future gets None if the request is dropped or times out.
+        '''
+        submitted = perf_counter()
+        if self.ws is None:
+            print(f"[XP_Websocket] not connected, {type} not sent")
+            return None
+        future = Future()
+        self.loop.call_soon_threadsafe(self._enqueue, (submitted, type, params, [client] if client else [], future))
+        self.latency["submit"].add(perf_counter() - submitted)
+        return future
+
+
+    async def request(self, type, params, client = None):
+        '''
+        Send a request and wait for the result message, for coroutines on any event loop.
+        '''
+        future = self.submit(type, params, client)
+        if future is None:
+            return None
+        return await asyncio.wrap_future(future)
+
+
+    def connected(self):
+        return self.ws is not None
+
+
+    def latency_summary(self):
+        '''
+        Latencies in ms: "submit", per message type the time until sent, "roundtrip" per
+        message type the percentiles until the result arrived, "reconnect" and the number
+        of requests still waiting for the result.
+        '''
+        summary = {name: stats.summary() for name, stats in list(self.latency.items())}
+        summary["roundtrip"] = {name: stats.summary() for name, stats in list(self.roundtrip.items())}
+        summary["reconnect"] = self.reconnect.summary()
+        summary["pending"] = len(self.requests)
+        return summary
+
+
+    def _enqueue(self, item):
+        if self.outbox is None:
+            item[4].set_result(None)
+            return
+        self.outbox.put_nowait(item)
+
+
+    def _schedule_subscribe(self):
+        if self.task is None or self.task.done():
+            self.task = self.loop.create_task(self._supervise())
+        elif self.ws is not None:
+            # wait a moment for the subscriptions of the other devices
+            if self.flush_handle:
+                self.flush_handle.cancel()
+            self.flush_handle = self.loop.call_later(SUBSCRIBE_DELAY, self._subscribe_new)
+
+
+    def _subscribe_new(self):
+        with self.lock:
+            ids = [id for id in self.routes if id not in self.subscribed]
+            clients = {client for id in ids for client in self.routes[id]}
+        if not ids or self.ws is None:
+            return
+        self.subscribed.update(ids)
+        self._enqueue((perf_counter(), "dataref_subscribe_values", {"datarefs": [{"id": id} for id in ids]}, clients, Future()))
+
+
+    async def _writer(self, ws, outbox):
+        while True:
+            items = [await outbox.get()]
+            while not outbox.empty():
+                items.append(outbox.get_nowait())
+            i = 0
+            while i < len(items):
+                # consecutive writes go into one dataref_set_values message
+                j = i + 1
+                if items[i][1] == "dataref_set_values":
+                    while j < len(items) and items[j][1] == "dataref_set_values":
+                        j += 1
                 try:
-                    msg = await ws.recv()
-                    data = json.loads(msg)
+                    await self._send(ws, items[i:j])
+                except asyncio.CancelledError:
+                    raise
                 except Exception as e:
-                    print(f"[WP_Websocket] Fehler im Listener: {e}")
-                    break
-                if update_callback:
-                    update_callback(data, dataref_list)
\ No newline at end of file
+                    # the writer keeps running, the requests of this batch are given up
+                    print(f"[XP_Websocket] send of {items[i][1]} failed: {e}")
+                    for item in items[i:j]:
+                        if not item[4].done():
+                            item[4].set_result(None)
+                i = j
+
+
+    async def _send(self, ws, items):
+        submitted, type, params, clients, future = items[0]
+        if len(items) > 1:
+            # coalesce writes to the same dataref (and index), the last value wins
+            datarefs = {}
+            clients = set()
+            for item in items:
+                for dataref in item[2]["datarefs"]:
+                    index = dataref.get("index")
+                    if isinstance(index, list):
+                        index = tuple(index)
+                    datarefs[(dataref["id"], index)] = dataref
+                clients.update(item[3])
+            params = {"datarefs": list(datarefs.values())}
+        req_id = self.req_id
+        self.req_id += 1
+        message = json.dumps({"req_id": req_id, "type": type, "params": params})
+        # registered before sending, the result may be received while send() still drains
+        timeout = self.loop.call_later(REQUEST_TIMEOUT, self._expire, req_id)
+        self.requests[req_id] = (type, perf_counter(), clients, [item[4] for item in items], timeout)
+        try:
+            await ws.send(message)
+        except Exception:
+            self._finish(req_id, None)
+            raise
+        sent = perf_counter()
+        stats = self.latency.get(type)
+        if stats is None:
+            stats = self.latency[type] = LatencyStats()
+        for item in items:
+            stats.add(sent - item[0])
+
+
+    async def _supervise(self):
+        '''
+        Keep the connection up: reconnect with backoff and restore the subscriptions.
+        '''
+        delay = RECONNECT_DELAY
+        lost = None # time the last connection was lost
+        while True:
+            connected = False
+            try:
+                async with websockets.connect(self.ws_url, open_timeout=100) as ws:
+                    connected = True
+                    delay = RECONNECT_DELAY
+                    await self._run(ws, lost)
+            except Exception as e:
+                # report the loss of the connection, not every failed retry
+                if connected or (lost is None and delay == RECONNECT_DELAY):
+                    print(f"[XP_Websocket] Fehler im Listener: {e}")
+            finally:
+                self._disconnected()
+            if connected:
+                lost = monotonic()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_DELAY_MAX)
+
+
+    async def _run(self, ws, lost):
+        self.outbox = asyncio.Queue()
+        writer = self.loop.create_task(self._writer(ws, self.outbox))
+        self.ws = ws
+        self.subscribed = set()
+        if lost is not None and self.routes:
+            # X-Plane may have been restarted, only reuse the ids if they are still valid,
+            # otherwise the devices subscribe again with new ids on their next connect
+            if self.ids_valid is None or not await self.loop.run_in_executor(None, self.ids_valid):
+                print("[XP_Websocket] ids changed, waiting for the devices to subscribe again")
+                with self.lock:
+                    self.routes = {}
+                    self.dispatch_table = {}
+            else:
+                self._subscribe_new()
+                self.reconnect.add(monotonic() - lost)
+                print(f"[XP_Websocket] reconnected, {len(self.subscribed)} datarefs subscribed again after {monotonic() - lost:.1f} s")
+        else:
+            await asyncio.sleep(SUBSCRIBE_DELAY)
+            self._subscribe_new()
+
+        # main-rx-Loop: get updates
+        try:
+            while True:
+                msg = await ws.recv()
+                if self.frame_log:
+                    self.frame_log.write(msg + "\n")
+                self._dispatch(json_loads(msg))
+        finally:
+            writer.cancel()
+
+
+    def _disconnected(self):
+        was_connected = self.ws is not None
+        self.ws = None
+        if self.outbox is not None:
+            # requests of the lost connection are dropped, a stale button press must not be sent later
+            while not self.outbox.empty():
+                self.outbox.get_nowait()[4].set_result(None)
+            self.outbox = None
+        # no results will come for the requests sent on the lost connection
+        for req_id in list(self.requests):
+            self._finish(req_id, None)
+        if was_connected:
+            for function in self.on_disconnect:
+                function()
+
+
+    def _dispatch(self, data):
+        mtype = data.get("type")
+        if mtype == "dataref_update_values":
+            routed = {} # key = client, value = dict ref_id -> value
+            table = self.dispatch_table
+            for ref_id_str, value in data["data"].items():
+                route = table.get(ref_id_str)
+                if route is None:
+                    continue
+                ref_id, targets = route
+                for client, indices in targets:
+                    values = routed.get(client)
+                    if values is None:
+                        values = routed[client] = {}
+                    if indices is not None and type(value) is list:
+                        length = len(value)
+                        values[ref_id] = {i: value[i] for i in indices if i < length}
+                    else:
+                        values[ref_id] = value
+            for client, values in routed.items():
+                self._callback(client, {"type": mtype, "data": values})
+        elif mtype == "result":
+            clients = self._finish(data.get("req_id"), data)
+            if data.get("success") != True:
+                if clients is None:
+                    clients = list(self.listeners)
+                for client in clients:
+                    self._callback(client, data)
+        else:
+            for client in list(self.listeners):
+                self._callback(client, data)
+
+
+    def _finish(self, req_id, result):
+        '''
+        Remove req_id from the pending requests and pass result to its futures,
+        returns the clients of the request (None if unknown).
+        '''
+        request = self.requests.pop(req_id, None)
+        if request is None:
+            return None
+        type, sent, clients, futures, timeout = request
+        timeout.cancel()
+        if result is not None:
+            stats = self.roundtrip.get(type)
+            if stats is None:
+                stats = self.roundtrip[type] = LatencyWindow()
+            stats.add(perf_counter() - sent)
+        for future in futures:
+            if not future.done():
+                future.set_result(result)
+        return clients
+
+
+    def _expire(self, req_id):
+        if req_id in self.requests:
+            print(f"[XP_Websocket] no result for {self.requests[req_id][0]} {req_id} after {REQUEST_TIMEOUT} s")
+            self._finish(req_id, None)
+
+
+    def _callback(self, client, data):
+        listener = self.listeners.get(client)
+        if listener is None:
+            print(f"[XP_Websocket] {data}")
+            return
+        update_callback, dataref_list = listener
+        if update_callback:
+            try:
+                update_callback(data, dataref_list)
+            except Exception as e:
+                # one faulty device must not stop the updates of the others
+                print(f"[XP_Websocket] Fehler im Callback {update_callback.__module__}: {e}")
+
+
+class XP_IdResolver:
+
+    '''
+    Name to id lookup for datarefs and commands of the X-Plane web API.
+    The full catalogues are fetched once and kept in an on-disk cache keyed by
+    X-Plane version and aircraft. On the first lookup after a (re)connect the
+    cache is validated with a few small requests, names missing in the catalogue
+    are fetched with batched filter requests in parallel.
+    '''
+
+    def __init__(self, rest_url = DEFAULT_XPLANE_REST_URL, cache_file = ID_CACHE_FILE):
+        self.rest_url = rest_url
+        self.cache_file = cache_file
+        self.http = Session()
+        self.http.mount("http://", HTTPAdapter(pool_maxsize=ID_FETCH_THREADS))
+        self.http.headers["Accept"] = "application/json"
+        self.lock = Lock()
+        self.valid = False
+        self.cache = None # file content, key = "version|aircraft"
+        self.key = None
+        self.indexes = {"datarefs": {}, "commands": {}} # key = name, value = id
+        self.save_timer = None
+
+
+    def invalidate(self):
+        self.valid = False
+
+
+    def dataref_id(self, name):
+        return self._lookup("datarefs", [name])[name]
+
+
+    def command_id(self, name):
+        return self._lookup("commands", [name])[name]
+
+
+    def dataref_ids(self, names):
+        return self._lookup("datarefs", names)
+
+
+    def command_ids(self, names):
+        return self._lookup("commands", names)
+
+
+    def _lookup(self, kind, names):
+        with self.lock:
+            if not self.valid:
+                self._validate()
+            index = self.indexes[kind]
+            missing = [name for name in names if name not in index]
+            if missing:
+                self._fetch_names(kind, missing)
+            return {name: index.get(name) for name in names}
+
+
+    def _get(self, path, params = None):
+        response = self.http.get(self.rest_url + path, params=params)
+        if response.status_code != 200:
+            return None
+        return response.json()["data"]
+
+
+    def _aircraft(self):
+        data = self._get("/datarefs", {"filter[name]": AIRCRAFT_DATAREF})
+        if not data:
+            return None, ""
+        id = data[0]["id"]
+        value = self._get(f"/datarefs/{id}/value")
+        if not isinstance(value, str):
+            return id, ""
+        return id, base64.b64decode(value).split(b"\0", 1)[0].decode(errors="replace")
+
+
+    def ids_valid(self):
+        '''
+        Validate the cache against the running X-Plane, True if the ids handed out so far are still valid.
+        '''
+        with self.lock:
+            key = self.key
+            datarefs = self.indexes["datarefs"]
+            self._validate()
+            return self.key == key and self.indexes["datarefs"] is datarefs
+
+
+    def _validate(self):
+        capabilities = self.http.get(self.rest_url.rsplit("/", 1)[0] + "/capabilities")
+        version = capabilities.json().get("x-plane", {}).get("version", "") if capabilities.status_code == 200 else ""
+        aircraft_id, aircraft = self._aircraft()
+        key = f"{version}|{aircraft}"
+        if self.cache is None:
+            self.cache = self._load()
+        entry = self.cache.get(key)
+        if entry and self._entry_valid(entry, aircraft_id):
+            print(f"[XP_Websocket] using cached ids for {aircraft or 'X-Plane'} {version}")
+        else:
+            entry = self._fetch_catalogues()
+            self.cache[key] = entry
+            self._write()
+        self.key = key
+        self.indexes = {"datarefs": entry["datarefs"], "commands": entry["commands"]}
+        self.valid = True
+
+
+    def _entry_valid(self, entry, aircraft_id):
+        # ids change when X-Plane loads plugins or aircraft in a different order
+        if aircraft_id is not None and entry["datarefs"].get(AIRCRAFT_DATAREF) != aircraft_id:
+            return False
+        for kind in ("datarefs", "commands"):
+            count = self._get(f"/{kind}/count")
+            if count is not None and count != entry["count"][kind]:
+                return False
+        return True
+
+
+    def _fetch_catalogues(self):
+        with ThreadPoolExecutor(2) as executor:
+            datarefs, commands = executor.map(lambda kind: self._get(f"/{kind}", {"fields": "id,name"}), ("datarefs", "commands"))
+        entry = {"count": {}}
+        for kind, data in (("datarefs", datarefs), ("commands", commands)):
+            entry[kind] = {item["name"]: item["id"] for item in data or ()}
+            entry["count"][kind] = len(entry[kind])
+        print(f"[XP_Websocket] fetched {len(entry['datarefs'])} dataref and {len(entry['commands'])} command ids")
+        return entry
+
+
+    def _fetch_batch(self, kind, names):
+        data = self._get(f"/{kind}", [("filter[name]", name) for name in names])
+        if data is None and len(names) > 1:
+            # an unknown name can fail the whole batch, retry one by one
+            data = []
+            for name in names:
+                data.extend(self._get(f"/{kind}", {"filter[name]": name}) or ())
+        return data or ()
+
+
+    def _fetch_names(self, kind, names):
+        index = self.indexes[kind]
+        batches = [names[i:i + ID_FETCH_BATCH] for i in range(0, len(names), ID_FETCH_BATCH)]
+        with ThreadPoolExecutor(ID_FETCH_THREADS) as executor:
+            for data in executor.map(lambda batch: self._fetch_batch(kind, batch), batches):
+                for item in data:
+                    index[item["name"]] = item["id"]
+        for name in names:
+            if name not in index:
+                print(f"could not get id for {kind[:-1]} {name}")
+        self._save_later()
+
+
+    def _load(self):
+        try:
+            with open(self.cache_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+
+    def _save_later(self):
+        # lookups come one by one while the devices connect, write the file once afterwards
+        if self.save_timer:
+            self.save_timer.cancel()
+        self.save_timer = Timer(1.0, self._save)
+        self.save_timer.daemon = True
+        self.save_timer.start()
+
+
+    def _save(self):
+        with self.lock:
+            self._write()
+
+
+    def _write(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(self.cache_file + ".tmp", "w") as f:
+                json.dump(self.cache, f)
+            os.replace(self.cache_file + ".tmp", self.cache_file)
+        except OSError as e:
+            print(f"[XP_Websocket] could not write id cache {self.cache_file}: {e}")
+
+
+shared = None
+shared_lock = Lock()
+shared_resolvers = {} # key = rest_url
+
+def shared_session(ws_url = DEFAULT_XPLANE_WS_URL):
+    '''
+    Return the process wide XP_WebsocketSession, create it on first use.
+    '''
+    global shared
+    with shared_lock:
+        if shared is None:
+            shared = XP_WebsocketSession(ws_url)
+    return shared
+
+
+def shared_resolver(rest_url = DEFAULT_XPLANE_REST_URL):
+    '''
+    Return the process wide XP_IdResolver for rest_url, create it on first use.
+    '''
+    with shared_lock:
+        if rest_url not in shared_resolvers:
+            shared_resolvers[rest_url] = XP_IdResolver(rest_url)
+    return shared_resolvers[rest_url]
+
+
+def led_array_indices(led_dataref_ids, array_0):
+    '''
+    Return the indices argument of datarefs_subscribe for led_dataref_ids
+    (dict id -> led or list of leds): the array elements used by the leds.
+    array_0 is the DREF_TYPE of element [0] of the calling device module.
+    '''
+    indices = {}
+    for ref_id, ledobj in led_dataref_ids.items():
+        if isinstance(ledobj, list):
+            used = {l.dreftype.value - array_0.value for l in ledobj if l.dreftype.value >= array_0.value}
+            if used:
+                indices[ref_id] = used
+    return indices